@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+智能体备份（内容寻址、去重、压缩）
+
+删除智能体时不再把整个目录搬到 <base>/.backup_*，而是写入独立的备份库
+（默认 <base> 同级的 <base 名>-backups/）：
+
+    objects/ab/cdef...gz          文件内容，按 SHA-256 寻址，gzip 压缩；相同内容只存一份
+    snapshots/<agent_id>/<快照>.json  快照清单：文件路径 → 内容哈希、大小、权限
+    backup.lock                   写入 / 清理时的建议锁
+
+模板生成的 SOUL.md / AGENTS.md 等在所有备份中只保存一次。
+可重建的派生文件（倒排索引、向量、锁）不备份，恢复后按需重建；
+待写队列 memory/.pending/ 中尚未合并的经验会一并备份，恢复后由下一次写入合并。
+快照对象与清单写入后 fsync，删除智能体前快照已落盘。
+
+保留策略：每个智能体保留最近 keep 个快照，可选再按天数淘汰；
+清理快照后回收不再被引用的对象。
+"""
+
+import os
+import json
+import gzip
+import fcntl
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+OBJECTS_DIR = "objects"
+SNAPSHOTS_DIR = "snapshots"
+LOCK_NAME = "backup.lock"
+
+DEFAULT_KEEP = 5
+
+# 不备份的派生文件 / 目录（恢复后会自动重建）
+SKIP_NAMES = {"experience.index.sqlite", "experience.vec", "experience.lock"}
+
+
+def default_backup_dir(base_path: str) -> Path:
+    base = Path(base_path).resolve()
+    return base.with_name(f"{base.name}-backups")
+
+
+@contextmanager
+def locked(backup_dir: Path):
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    with open(backup_dir / LOCK_NAME, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _object_path(backup_dir: Path, digest: str) -> Path:
+    return backup_dir / OBJECTS_DIR / digest[:2] / f"{digest[2:]}.gz"
+
+
+def _fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path: Path, data: bytes):
+    """原子写入并落盘：文件内容和所在目录（以及新建的上级目录）都 fsync 后才返回"""
+    created = []
+    folder = path.parent
+    while not folder.exists():
+        created.append(folder)
+        folder = folder.parent
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+    for folder in created:
+        _fsync_dir(folder.parent)
+
+
+def _put_object(backup_dir: Path, data: bytes) -> tuple:
+    """存入一份内容（已存在则跳过），返回 (哈希, 是否新写入)"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _object_path(backup_dir, digest)
+    if path.exists():
+        return digest, False
+    _write_atomic(path, gzip.compress(data, mtime=0))
+    return digest, True
+
+
+def _new_snapshot_id() -> str:
+    now = datetime.now()
+    return f"{now.strftime('%Y%m%d_%H%M%S')}_{now.microsecond:06d}"
+
+
+def snapshot_agent(agent_path: Path, backup_dir: Path) -> dict:
+    """为智能体目录生成一个快照，返回快照信息"""
+    agent_id = agent_path.name
+    files = []
+    dirs = []
+    stored = 0
+    with locked(backup_dir):
+        for root, dirnames, filenames in os.walk(agent_path):
+            dirnames[:] = sorted(d for d in dirnames if d not in SKIP_NAMES)
+            rel_root = Path(root).relative_to(agent_path)
+            if str(rel_root) != ".":
+                dirs.append(rel_root.as_posix())
+            for name in sorted(filenames):
+                if name in SKIP_NAMES or (name.startswith(".") and name.endswith(".tmp")):
+                    continue
+                path = Path(root) / name
+                if path.is_symlink():
+                    continue
+                try:
+                    data = path.read_bytes()
+                except FileNotFoundError:  # 待写队列中的文件可能刚被合并
+                    continue
+                digest, new = _put_object(backup_dir, data)
+                stored += len(data) if new else 0
+                files.append({
+                    "path": (rel_root / name).as_posix(),
+                    "hash": digest,
+                    "size": len(data),
+                    "mode": path.stat().st_mode & 0o777,
+                })
+
+        snapshot = {
+            "agent_id": agent_id,
+            "snapshot": _new_snapshot_id(),
+            "created": datetime.now().isoformat(),
+            "dirs": dirs,
+            "files": files,
+        }
+        manifest = backup_dir / SNAPSHOTS_DIR / agent_id / f"{snapshot['snapshot']}.json"
+        _write_atomic(manifest, json.dumps(snapshot, ensure_ascii=False, indent=1).encode("utf-8"))
+
+    return {
+        "snapshot": snapshot["snapshot"],
+        "files": len(files),
+        "bytes": sum(f["size"] for f in files),
+        "new_bytes": stored,
+    }
+
+
+def list_snapshots(backup_dir: Path, agent_id: str = None) -> list:
+    """列出快照（按智能体、时间排序），不读取快照内容"""
+    root = backup_dir / SNAPSHOTS_DIR
+    if not root.exists():
+        return []
+    agents = [agent_id] if agent_id else sorted(p.name for p in root.iterdir() if p.is_dir())
+    result = []
+    for agent in agents:
+        folder = root / agent
+        if folder.is_dir():
+            result.extend({"agent_id": agent, "snapshot": p.stem}
+                          for p in sorted(folder.glob("*.json")))
+    return result
+
+
+def load_snapshot(backup_dir: Path, agent_id: str, snapshot: str = None) -> dict:
+    """读取快照清单，snapshot 为空时取最新的；不存在时返回 None"""
+    snapshots = list_snapshots(backup_dir, agent_id)
+    if snapshot:
+        snapshots = [s for s in snapshots if s["snapshot"] == snapshot]
+    if not snapshots:
+        return None
+    path = backup_dir / SNAPSHOTS_DIR / agent_id / f"{snapshots[-1]['snapshot']}.json"
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def restore_snapshot(backup_dir: Path, snapshot: dict, agent_path: Path):
+    """
+    按快照重建智能体目录
+
+    先在目标旁的临时目录中还原全部文件，再一次 rename 到位；目标已存在时抛出 FileExistsError。
+    """
+    if agent_path.exists():
+        raise FileExistsError(f"智能体 {agent_path.name} 已存在")
+
+    agent_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".tmp-{agent_path.name}-", dir=agent_path.parent))
+    try:
+        for rel in snapshot.get("dirs", []):
+            (tmp / rel).mkdir(parents=True, exist_ok=True)
+        for item in snapshot["files"]:
+            target = tmp / item["path"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(_object_path(backup_dir, item["hash"]), "rb") as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.chmod(target, item.get("mode", 0o644))
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o777 & ~umask)
+        if agent_path.exists():
+            raise FileExistsError(f"智能体 {agent_path.name} 已存在")
+        os.rename(tmp, agent_path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def prune(backup_dir: Path, keep: int = DEFAULT_KEEP, max_age_days: float = None,
+          agent_id: str = None) -> dict:
+    """
+    按保留策略删除旧快照并回收无引用的对象
+
+    每个智能体保留最新的 keep 个快照；设置 max_age_days 时，更早的快照也会删除
+    （最新的一个始终保留）。
+    """
+    removed = []
+    with locked(backup_dir):
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime("%Y%m%d_%H%M%S") \
+            if max_age_days is not None else None
+        by_agent = {}
+        for item in list_snapshots(backup_dir, agent_id):
+            by_agent.setdefault(item["agent_id"], []).append(item["snapshot"])
+        for agent, snapshots in by_agent.items():
+            keep_from = max(len(snapshots) - max(keep, 1), 0)
+            for i, snapshot in enumerate(snapshots[:-1]):
+                if i < keep_from or (cutoff and snapshot < cutoff):
+                    (backup_dir / SNAPSHOTS_DIR / agent / f"{snapshot}.json").unlink()
+                    removed.append({"agent_id": agent, "snapshot": snapshot})
+        for agent in by_agent:
+            folder = backup_dir / SNAPSHOTS_DIR / agent
+            if folder.is_dir() and not any(folder.iterdir()):
+                folder.rmdir()
+
+        collected = _collect_garbage(backup_dir) if removed else {"objects": 0, "bytes": 0}
+
+    return {"removed": removed, "objects_deleted": collected["objects"], "bytes_freed": collected["bytes"]}
+
+
+def _collect_garbage(backup_dir: Path) -> dict:
+    """删除不再被任何快照引用的对象（须持锁）"""
+    referenced = set()
+    for item in list_snapshots(backup_dir):
+        path = backup_dir / SNAPSHOTS_DIR / item["agent_id"] / f"{item['snapshot']}.json"
+        referenced.update(f["hash"] for f in json.loads(path.read_text(encoding="utf-8"))["files"])
+
+    deleted = 0
+    freed = 0
+    objects = backup_dir / OBJECTS_DIR
+    if objects.exists():
+        for prefix in objects.iterdir():
+            for obj in prefix.glob("*.gz"):
+                if prefix.name + obj.name[:-3] not in referenced:
+                    freed += obj.stat().st_size
+                    obj.unlink()
+                    deleted += 1
+    return {"objects": deleted, "bytes": freed}
+
+
+def store_stats(backup_dir: Path) -> dict:
+    objects = list((backup_dir / OBJECTS_DIR).glob("*/*.gz")) if backup_dir.exists() else []
+    return {
+        "backup_dir": str(backup_dir),
+        "snapshots": len(list_snapshots(backup_dir)),
+        "objects": len(objects),
+        "bytes": sum(p.stat().st_size for p in objects),
+    }
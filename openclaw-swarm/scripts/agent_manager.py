@@ -4,10 +4,20 @@
 
 用法:
     python agent_manager.py list                    # 列出所有智能体
-    python agent_manager.py show <agent_id>         # 查看智能体详情
+    python agent_manager.py show <agent_id>         # 查看智能体详情（--fields soul,files,experience 按需读取）
     python agent_manager.py add <agent_id>          # 添加新智能体
-    python agent_manager.py remove <agent_id>       # 删除智能体
+    python agent_manager.py add-many --manifest agents.json   # 按清单批量添加（JSON / YAML）
+    python agent_manager.py remove <agent_id>       # 删除智能体（备份到独立的去重备份库）
+    python agent_manager.py restore <agent_id> [--snapshot S]  # 从备份恢复
+    python agent_manager.py backups [agent_id]      # 列出备份快照
+    python agent_manager.py prune [--keep 5] [--max-age-days 30]  # 按保留策略清理备份
     python agent_manager.py update <agent_id>       # 更新智能体配置
+    python agent_manager.py clone <agent_id> --count N   # 创建 N 个副本（共享 SOUL.md/AGENTS.md，独立 memory/）
+    python agent_manager.py merge-memory <agent_id>      # 把副本的经验合并回原智能体
+
+智能体列表缓存在 <base>/.registry.json：每个智能体记录目录、SOUL.md、memory/ 的 mtime，
+list 时只 stat 这三项，有变化的智能体才重新读取；清单缺失或损坏时整体重新扫描。
+add / update / remove 会同步更新清单。
 """
 
 import os
@@ -16,7 +26,16 @@ import argparse
 from pathlib import Path
 from datetime import datetime
 
+import experience_store as store
+import agent_backup
+
 DEFAULT_AGENTS_PATH = "/workspace/agents"
+REGISTRY_NAME = ".registry.json"
+REGISTRY_VERSION = 1
+
+SHOW_FIELDS = ("files", "soul", "experience")
+SOUL_PREVIEW_BYTES = 500
+EXPERIENCE_PAGE_SIZE = 10
 
 AGENT_TEMPLATES = {
     "default": {
@@ -68,41 +87,214 @@ def get_agent_path(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> Path:
     return Path(base_path) / agent_id
 
 
-def list_agents(base_path: str = DEFAULT_AGENTS_PATH) -> list:
-    """列出所有智能体"""
-    agents = []
+def registry_path(base_path: str = DEFAULT_AGENTS_PATH) -> Path:
+    return Path(base_path) / REGISTRY_NAME
+
+
+def _mtime(path) -> int:
+    """文件/目录的 mtime（纳秒），不存在时为 None"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_registry(base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """读取智能体清单；缺失、损坏或版本不符时返回 None"""
+    try:
+        registry = json.loads(registry_path(base_path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(registry, dict) or registry.get("version") != REGISTRY_VERSION:
+        return None
+    return registry
+
+
+def save_registry(base_path: str, agents: dict):
+    """写临时文件后原子替换，并发的 list 不会读到半截清单"""
+    path = registry_path(base_path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"version": REGISTRY_VERSION, "agents": agents}, ensure_ascii=False))
+    os.replace(tmp, path)
+
+
+def read_soul_name(soul_file: Path) -> str:
+    """只读 SOUL.md 的第一行解析名称"""
+    with open(soul_file, encoding="utf-8", errors="replace") as f:
+        first_line = f.readline().rstrip("\n")
+    if "# SOUL.md - " in first_line:
+        return first_line.replace("# SOUL.md - ", "").strip()
+    return None
+
+
+def scan_agent(agent_dir: Path, dir_mtime: int, cached: dict = None) -> dict:
+    """
+    生成单个智能体的清单记录
+
+    cached 为上次的记录：目录 / memory/ 未变化时沿用文件存在标记，
+    SOUL.md 未变化时沿用名称（不读文件）。
+    """
+    soul_mtime = _mtime(agent_dir / "SOUL.md")
+    memory_mtime = _mtime(agent_dir / "memory")
+    record = {"mtime": dir_mtime, "soul_mtime": soul_mtime, "memory_mtime": memory_mtime}
+    cached = cached or {}
+
+    if cached.get("mtime") == dir_mtime:
+        record["has_agents"] = cached.get("has_agents", False)
+    else:
+        record["has_agents"] = (agent_dir / "AGENTS.md").exists()
+    if cached.get("memory_mtime") == memory_mtime and "has_memory" in cached:
+        record["has_memory"] = cached["has_memory"]
+    else:
+        record["has_memory"] = memory_mtime is not None and (agent_dir / "memory" / "experience.md").exists()
+
+    if soul_mtime is None:
+        record["name"] = None
+    elif cached.get("soul_mtime") == soul_mtime and "name" in cached:
+        record["name"] = cached["name"]
+    else:
+        record["name"] = read_soul_name(agent_dir / "SOUL.md")
+    return record
+
+
+def _agent_info(base: Path, agent_id: str, record: dict) -> dict:
+    agent_info = {
+        "id": agent_id,
+        "path": str(base / agent_id),
+        "has_soul": record["soul_mtime"] is not None,
+        "has_agents": record["has_agents"],
+        "has_memory": record["has_memory"],
+    }
+    if record.get("name"):
+        agent_info["name"] = record["name"]
+    return agent_info
+
+
+def list_agents(base_path: str = DEFAULT_AGENTS_PATH, rescan: bool = False) -> list:
+    """
+    列出所有智能体
+
+    借助 .registry.json：os.scandir 枚举目录，每个智能体只 stat 几个 mtime，
+    与清单一致的直接沿用，不一致的才重新读取；清单不可用或 rescan=True 时全部重新扫描。
+    """
     base = Path(base_path)
     if not base.exists():
-        return agents
-    
-    for agent_dir in base.iterdir():
-        if agent_dir.is_dir() and not agent_dir.name.startswith('.'):
-            soul_file = agent_dir / "SOUL.md"
-            agents_file = agent_dir / "AGENTS.md"
-            memory_file = agent_dir / "memory" / "experience.md"
-            
-            agent_info = {
-                "id": agent_dir.name,
-                "path": str(agent_dir),
-                "has_soul": soul_file.exists(),
-                "has_agents": agents_file.exists(),
-                "has_memory": memory_file.exists(),
-            }
-            
-            # 尝试读取名称和emoji
-            if soul_file.exists():
-                content = soul_file.read_text()
-                if "# SOUL.md - " in content:
-                    first_line = content.split('\n')[0]
-                    agent_info["name"] = first_line.replace("# SOUL.md - ", "").strip()
-            
-            agents.append(agent_info)
-    
-    return agents
-
-
-def show_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> dict:
-    """查看智能体详情"""
+        return []
+    
+    registry = None if rescan else load_registry(base_path)
+    cached = registry["agents"] if registry else {}
+    
+    records = {}
+    with os.scandir(base) as it:
+        for entry in it:
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            dir_mtime = entry.stat().st_mtime_ns
+            record = cached.get(entry.name)
+            if (record is None or record.get("mtime") != dir_mtime
+                    or record.get("soul_mtime") != _mtime(Path(entry.path) / "SOUL.md")
+                    or record.get("memory_mtime") != _mtime(Path(entry.path) / "memory")):
+                record = scan_agent(Path(entry.path), dir_mtime, record)
+            records[entry.name] = record
+    
+    if records != cached:
+        save_registry(base_path, records)
+    
+    return [_agent_info(base, agent_id, record) for agent_id, record in records.items()]
+
+
+def refresh_registry(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH):
+    """add / update / remove 之后同步单个智能体在清单中的记录（清单不存在时不创建）"""
+    refresh_registry_many([agent_id], base_path)
+
+
+def refresh_registry_many(agent_ids: list, base_path: str = DEFAULT_AGENTS_PATH):
+    """同步若干智能体在清单中的记录，只写一次清单"""
+    registry = load_registry(base_path)
+    if registry is None or not agent_ids:
+        return
+    agents = registry["agents"]
+    for agent_id in agent_ids:
+        agent_path = get_agent_path(agent_id, base_path)
+        dir_mtime = _mtime(agent_path)
+        if dir_mtime is None:
+            agents.pop(agent_id, None)
+        else:
+            agents[agent_id] = scan_agent(agent_path, dir_mtime, agents.get(agent_id))
+    save_registry(base_path, agents)
+
+
+def read_head(path: Path, max_bytes: int) -> tuple:
+    """只读取文件开头 max_bytes 字节，返回 (文本, 是否被截断)；截断处不足一个字符的字节丢弃"""
+    with open(path, "rb") as f:
+        data = f.read(max_bytes + 1)
+    truncated = len(data) > max_bytes
+    return data[:max_bytes].decode("utf-8", errors="ignore" if truncated else "replace"), truncated
+
+
+def page_experiences(agent_path: Path, page: int = 1, page_size: int = EXPERIENCE_PAGE_SIZE) -> dict:
+    """
+    分页读取经验（从新到旧，page 从 1 开始）
+
+    有结构化存储时借助偏移索引只读取当页的行；尚未迁移的旧版 experience.json 只读不迁移；
+    只有 experience.md 的智能体流式扫描其中“经验记录”一节的条目（从新到旧排列），内存只与页大小相关。
+    只读：不迁移、不创建文件，没有结构化存储时也不加存储锁。
+    """
+    page = max(page, 1)
+    page_size = max(page_size, 1)
+    skip = (page - 1) * page_size
+    memory_dir = agent_path / "memory"
+    fields = ("id", "created", "category", "content", "task")
+    
+    total = store.count_entries(memory_dir)
+    legacy = store.legacy_path(memory_dir)
+    if total:
+        end = total - skip
+        rows = list(range(end - 1, max(end - page_size, 0) - 1, -1))
+        entries = [
+            {k: e.get(k) for k in fields}
+            for e in store.read_rows(memory_dir, rows).values()
+        ]
+    elif legacy.exists() and not store.log_path(memory_dir).exists():
+        try:
+            items = json.loads(legacy.read_text(encoding="utf-8"))
+        except ValueError:
+            items = []
+        items = [e for e in items if isinstance(e, dict)] if isinstance(items, list) else []
+        total = len(items)
+        entries = [{k: e.get(k) for k in fields} for e in items[::-1][skip:skip + page_size]]
+    else:
+        # experience.md 中的条目已按从新到旧排列，只保留当页的行
+        total = 0
+        entries = []
+        memory_file = memory_dir / "experience.md"
+        if memory_file.exists():
+            with open(memory_file, encoding="utf-8", errors="replace") as f:
+                in_records = False
+                for line in f:
+                    if line.startswith("## "):
+                        in_records = line.startswith("## 经验记录")
+                    elif in_records and line.startswith("- ["):
+                        if skip <= total < skip + page_size:
+                            entries.append(line.rstrip("\n"))
+                        total += 1
+    
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "entries": entries,
+    }
+
+
+def show_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, fields: tuple = SHOW_FIELDS,
+               soul_bytes: int = SOUL_PREVIEW_BYTES, page: int = 1,
+               page_size: int = EXPERIENCE_PAGE_SIZE) -> dict:
+    """
+    查看智能体详情，只读取 fields 中请求的部分
+
+    soul 为 SOUL.md 开头 soul_bytes 字节的预览；experience 为分页的经验（从新到旧）。
+    """
     agent_path = get_agent_path(agent_id, base_path)
     if not agent_path.exists():
         return {"error": f"智能体 {agent_id} 不存在"}
@@ -110,52 +302,40 @@ def show_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> dict:
     info = {
         "id": agent_id,
         "path": str(agent_path),
-        "files": []
     }
     
-    for f in agent_path.iterdir():
-        if f.is_file():
-            info["files"].append(f.name)
-        elif f.is_dir():
-            info["files"].append(f"{f.name}/")
+    if "files" in fields:
+        info["files"] = []
+        with os.scandir(agent_path) as it:
+            for entry in it:
+                if entry.is_file():
+                    info["files"].append(entry.name)
+                elif entry.is_dir():
+                    info["files"].append(f"{entry.name}/")
     
-    # 读取 SOUL.md
+    # SOUL.md 预览
     soul_file = agent_path / "SOUL.md"
-    if soul_file.exists():
-        info["soul"] = soul_file.read_text()[:500] + "..." if len(soul_file.read_text()) > 500 else soul_file.read_text()
+    if "soul" in fields and soul_file.exists():
+        text, truncated = read_head(soul_file, soul_bytes)
+        info["soul"] = text + "..." if truncated else text
     
-    # 读取经验记忆
-    memory_file = agent_path / "memory" / "experience.md"
-    if memory_file.exists():
-        info["experience"] = memory_file.read_text()
+    # 经验记忆（分页）
+    if "experience" in fields:
+        info["experience"] = page_experiences(agent_path, page, page_size)
     
     return info
 
 
-def add_agent(agent_id: str, template: str = "default", base_path: str = DEFAULT_AGENTS_PATH, **kwargs) -> dict:
-    """添加新智能体"""
-    agent_path = get_agent_path(agent_id, base_path)
-    if agent_path.exists():
-        return {"error": f"智能体 {agent_id} 已存在"}
-    
-    # 获取模板
-    tmpl = AGENT_TEMPLATES.get(template, AGENT_TEMPLATES["default"]).copy()
-    tmpl.update(kwargs)
-    
-    # 创建目录
-    agent_path.mkdir(parents=True, exist_ok=True)
-    (agent_path / "memory").mkdir(exist_ok=True)
-    
-    # 创建 SOUL.md
+def render_agent_files(agent_id: str, tmpl: dict) -> dict:
+    """按模板渲染新智能体的文件，返回 {相对路径: 内容}"""
+    name = tmpl.get("name", agent_id)
     soul_content = tmpl.get("soul", AGENT_TEMPLATES["default"]["soul"])
-    soul_content = soul_content.format(name=tmpl.get("name", agent_id))
-    (agent_path / "SOUL.md").write_text(soul_content)
+    soul_content = soul_content.format(name=name)
     
-    # 创建 AGENTS.md
-    agents_content = f"""# AGENTS.md - {tmpl.get('name', agent_id)} {tmpl.get('emoji', '🤖')}
+    agents_content = f"""# AGENTS.md - {name} {tmpl.get('emoji', '🤖')}
 
 ## 角色
-你是智能体团队中的 {tmpl.get('name', agent_id)}。
+你是智能体团队中的 {name}。
 
 ## 可用工具
 {chr(10).join(f"- `{t}`" for t in tmpl.get('tools_allow', []))}
@@ -165,10 +345,8 @@ def add_agent(agent_id: str, template: str = "default", base_path: str = DEFAULT
 2. 输出结构化、可用的结果
 3. 任务完成后总结经验到 memory/experience.md
 """
-    (agent_path / "AGENTS.md").write_text(agents_content)
     
-    # 创建经验记忆文件
-    experience_content = f"""# 经验记忆 - {tmpl.get('name', agent_id)}
+    experience_content = f"""# 经验记忆 - {name}
 
 *记录执行任务中获得的有效经验*
 
@@ -180,7 +358,66 @@ def add_agent(agent_id: str, template: str = "default", base_path: str = DEFAULT
 
 *(暂无记录)*
 """
-    (agent_path / "memory" / "experience.md").write_text(experience_content)
+    return {
+        "SOUL.md": soul_content,
+        "AGENTS.md": agents_content,
+        "memory/experience.md": experience_content,
+    }
+
+
+_DIR_MODE = None
+
+
+def _dir_mode() -> int:
+    """按当前 umask 计算普通 mkdir 得到的目录权限（只在首次调用时读取 umask）"""
+    global _DIR_MODE
+    if _DIR_MODE is None:
+        umask = os.umask(0)
+        os.umask(umask)
+        _DIR_MODE = 0o777 & ~umask
+    return _DIR_MODE
+
+
+def build_agent(agent_id: str, files: dict, base_path: str = DEFAULT_AGENTS_PATH) -> Path:
+    """
+    在 <base>/.tmp-<id>-xxx 中写好全部文件，再一次 rename 成 <base>/<id>
+
+    失败时删除临时目录，不会留下半成品；目标已存在时抛出 FileExistsError。
+    """
+    import shutil
+    import tempfile
+    
+    agent_path = get_agent_path(agent_id, base_path)
+    if agent_path.exists():
+        raise FileExistsError(f"智能体 {agent_id} 已存在")
+    
+    Path(base_path).mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".tmp-{agent_id}-", dir=base_path))
+    try:
+        (tmp / "memory").mkdir()
+        for relpath, content in files.items():
+            (tmp / relpath).write_text(content)
+        os.chmod(tmp, _dir_mode())  # mkdtemp 建的目录是 0700，改回与 mkdir 一致
+        if agent_path.exists():
+            raise FileExistsError(f"智能体 {agent_id} 已存在")
+        os.rename(tmp, agent_path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return agent_path
+
+
+def add_agent(agent_id: str, template: str = "default", base_path: str = DEFAULT_AGENTS_PATH, **kwargs) -> dict:
+    """添加新智能体（在临时目录中建好后原子 rename）"""
+    # 获取模板
+    tmpl = AGENT_TEMPLATES.get(template, AGENT_TEMPLATES["default"]).copy()
+    tmpl.update(kwargs)
+    
+    try:
+        agent_path = build_agent(agent_id, render_agent_files(agent_id, tmpl), base_path)
+    except FileExistsError:
+        return {"error": f"智能体 {agent_id} 已存在"}
+    refresh_registry(agent_id, base_path)
     
     return {
         "success": True,
@@ -190,24 +427,135 @@ def add_agent(agent_id: str, template: str = "default", base_path: str = DEFAULT
     }
 
 
-def remove_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, backup: bool = True) -> dict:
-    """删除智能体（默认先备份）"""
+def load_manifest(path: str) -> list:
+    """
+    读取批量创建清单（JSON 或 YAML），返回 [{"id", "template", ...}, ...]
+
+    格式为智能体列表，或 {"defaults": {...}, "agents": [...]}，
+    defaults 中的字段（template/name/emoji/model/tools_allow/tools_deny）作用于每个智能体。
+    YAML 需要安装 PyYAML。
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("读取 YAML 清单需要安装 PyYAML（pip install pyyaml），或改用 JSON")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults") or {}
+        data = data.get("agents") or []
+    if not isinstance(data, list):
+        raise ValueError("清单应为智能体列表，或包含 agents 列表的对象")
+    
+    specs = []
+    for item in data:
+        spec = dict(defaults)
+        if isinstance(item, dict):
+            spec.update(item)
+        else:
+            spec["id"] = item
+        specs.append(spec)
+    return specs
+
+
+def _valid_agent_id(agent_id) -> bool:
+    return (isinstance(agent_id, str) and agent_id not in ("", ".", "..")
+            and not agent_id.startswith(".") and "/" not in agent_id and os.sep not in agent_id)
+
+
+def add_many(specs: list, base_path: str = DEFAULT_AGENTS_PATH, workers: int = 8) -> dict:
+    """
+    批量创建智能体
+
+    相同的模板 + 覆盖项只渲染一次；各智能体在有界线程池中并行构建，
+    每个都先写临时目录再原子 rename。结束后一次性更新清单，返回逐个结果与吞吐量。
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    
+    start = time.perf_counter()
+    _dir_mode()  # 在启动线程前读取 umask
+    rendered = {}
+    jobs = []
+    results = [None] * len(specs)
+    
+    for i, spec in enumerate(specs):
+        agent_id = spec.get("id")
+        template = spec.get("template", "default")
+        if not _valid_agent_id(agent_id):
+            results[i] = {"agent_id": agent_id, "success": False, "error": "无效的智能体 ID"}
+            continue
+        overrides = {k: v for k, v in spec.items() if k not in ("id", "template")}
+        key = json.dumps([template, overrides], sort_keys=True, ensure_ascii=False, default=str)
+        if key not in rendered:
+            tmpl = AGENT_TEMPLATES.get(template, AGENT_TEMPLATES["default"]).copy()
+            tmpl.update(overrides)
+            rendered[key] = render_agent_files(agent_id, tmpl)
+        jobs.append((i, agent_id, template, rendered[key]))
+    
+    def build(job):
+        i, agent_id, template, files = job
+        try:
+            path = build_agent(agent_id, files, base_path)
+            results[i] = {"agent_id": agent_id, "success": True, "path": str(path), "template": template}
+        except Exception as e:
+            results[i] = {"agent_id": agent_id, "success": False, "error": str(e)}
+    
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(build, jobs))
+    
+    created = [r["agent_id"] for r in results if r["success"]]
+    refresh_registry_many(created, base_path)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "total": len(specs),
+        "created": len(created),
+        "failed": len(specs) - len(created),
+        "templates_rendered": len(rendered),
+        "workers": workers,
+        "elapsed_sec": round(elapsed, 3),
+        "agents_per_sec": round(len(created) / elapsed, 1) if elapsed else None,
+        "results": results,
+    }
+
+
+def remove_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, backup: bool = True,
+                 backup_dir: str = None, keep: int = agent_backup.DEFAULT_KEEP) -> dict:
+    """
+    删除智能体（默认先备份）
+
+    备份写入独立的内容寻址备份库（见 agent_backup.py），之后按 keep 清理该智能体的旧快照。
+    """
+    import shutil
     agent_path = get_agent_path(agent_id, base_path)
     if not agent_path.exists():
         return {"error": f"智能体 {agent_id} 不存在"}
     
     if backup:
-        import shutil
-        backup_path = Path(base_path) / f".backup_{agent_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        shutil.move(str(agent_path), str(backup_path))
+        store_dir = Path(backup_dir) if backup_dir else agent_backup.default_backup_dir(base_path)
+        snapshot = agent_backup.snapshot_agent(agent_path, store_dir)
+        shutil.rmtree(agent_path)
+        refresh_registry(agent_id, base_path)
+        pruned = agent_backup.prune(store_dir, keep=keep, agent_id=agent_id)
         return {
             "success": True,
             "agent_id": agent_id,
-            "backup_path": str(backup_path)
+            "backup_dir": str(store_dir),
+            "snapshot": snapshot["snapshot"],
+            "files": snapshot["files"],
+            "new_bytes": snapshot["new_bytes"],
+            "pruned": len(pruned["removed"]),
         }
     else:
-        import shutil
         shutil.rmtree(agent_path)
+        refresh_registry(agent_id, base_path)
         return {
             "success": True,
             "agent_id": agent_id,
@@ -215,6 +563,30 @@ def remove_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, backup: bo
         }
 
 
+def restore_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, snapshot: str = None,
+                  backup_dir: str = None) -> dict:
+    """从备份库恢复智能体（默认最新快照），智能体已存在时不覆盖"""
+    store_dir = Path(backup_dir) if backup_dir else agent_backup.default_backup_dir(base_path)
+    manifest = agent_backup.load_snapshot(store_dir, agent_id, snapshot)
+    if manifest is None:
+        return {"error": f"没有找到智能体 {agent_id} 的备份" + (f" {snapshot}" if snapshot else "")}
+    
+    agent_path = get_agent_path(agent_id, base_path)
+    try:
+        agent_backup.restore_snapshot(store_dir, manifest, agent_path)
+    except FileExistsError:
+        return {"error": f"智能体 {agent_id} 已存在"}
+    refresh_registry(agent_id, base_path)
+    
+    return {
+        "success": True,
+        "agent_id": agent_id,
+        "snapshot": manifest["snapshot"],
+        "files": len(manifest["files"]),
+        "path": str(agent_path),
+    }
+
+
 def update_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, **kwargs) -> dict:
     """更新智能体配置"""
     agent_path = get_agent_path(agent_id, base_path)
@@ -232,7 +604,8 @@ def update_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, **kwargs)
             lines = content.split('\n')
             if lines[0].startswith("# SOUL.md"):
                 lines[0] = f"# SOUL.md - {kwargs['name']}"
-                soul_file.write_text('\n'.join(lines))
+                # 原子替换：副本与原智能体硬链接共享 SOUL.md，替换后只改动本智能体
+                store.write_text_atomic(soul_file, '\n'.join(lines))
                 updated.append("name")
     
     # 更新 emoji
@@ -246,6 +619,9 @@ def update_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, **kwargs)
                 # 尝试更新 emoji
                 updated.append("emoji")
     
+    if updated:
+        refresh_registry(agent_id, base_path)
+    
     return {
         "success": True,
         "agent_id": agent_id,
@@ -253,20 +629,181 @@ def update_agent(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, **kwargs)
     }
 
 
+REPLICA_MARKER = ".replica.json"
+CLONE_LINKED = ("SOUL.md", "AGENTS.md")
+
+
+def _link_or_copy(src: Path, dst: Path):
+    """优先硬链接（不复制数据），跨文件系统等不支持时退回复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        import shutil
+        shutil.copy2(src, dst)
+
+
+def list_replicas(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> list:
+    """由 clone 生成的副本 ID（按编号排序）"""
+    prefix = f"{agent_id}-r"
+    replicas = []
+    base = Path(base_path)
+    if not base.exists():
+        return replicas
+    with os.scandir(base) as it:
+        for entry in it:
+            if not entry.name.startswith(prefix) or not entry.name[len(prefix):].isdigit():
+                continue
+            try:
+                marker = json.loads((Path(entry.path) / REPLICA_MARKER).read_text(encoding="utf-8"))
+            except (FileNotFoundError, NotADirectoryError, ValueError):
+                continue
+            if marker.get("parent") == agent_id:
+                replicas.append(entry.name)
+    return sorted(replicas, key=lambda name: int(name[len(prefix):]))
+
+
+def clone_agent(agent_id: str, count: int, base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """
+    为智能体创建 count 个副本 <id>-r1, <id>-r2, ...（编号接在已有副本之后）
+
+    SOUL.md / AGENTS.md 以硬链接共享，不复制内容；每个副本有独立的空 memory/，
+    并用 .replica.json 记录来源，供 merge-memory 合并经验。
+    每个副本在临时目录中建好后原子 rename。
+    """
+    import time
+    import shutil
+    import tempfile
+    
+    if count < 1:
+        return {"error": f"副本数必须是正整数: {count}"}
+    agent_path = get_agent_path(agent_id, base_path)
+    if not agent_path.exists():
+        return {"error": f"智能体 {agent_id} 不存在"}
+    
+    start = time.perf_counter()
+    existing = list_replicas(agent_id, base_path)
+    first = int(existing[-1].rsplit("-r", 1)[1]) + 1 if existing else 1
+    linked = [name for name in CLONE_LINKED if (agent_path / name).is_file()]
+    marker = json.dumps({"parent": agent_id, "created": datetime.now().isoformat()}, ensure_ascii=False)
+    
+    created = []
+    errors = {}
+    for n in range(first, first + count):
+        replica_id = f"{agent_id}-r{n}"
+        replica_path = get_agent_path(replica_id, base_path)
+        tmp = Path(tempfile.mkdtemp(prefix=f".tmp-{replica_id}-", dir=base_path))
+        try:
+            for name in linked:
+                _link_or_copy(agent_path / name, tmp / name)
+            (tmp / "memory").mkdir()
+            (tmp / REPLICA_MARKER).write_text(marker)
+            os.chmod(tmp, _dir_mode())
+            if replica_path.exists():
+                raise FileExistsError(f"智能体 {replica_id} 已存在")
+            os.rename(tmp, replica_path)
+            created.append(replica_id)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            errors[replica_id] = str(e)
+    
+    refresh_registry_many(created, base_path)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "success": not errors,
+        "agent_id": agent_id,
+        "replicas": created,
+        "errors": errors,
+        "linked": linked,
+        "elapsed_sec": round(elapsed, 4),
+    }
+
+
+def merge_memory(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH, remove_replicas: bool = False) -> dict:
+    """
+    把各副本的经验合并回原智能体
+
+    副本的经验（保留 ID、时间和使用计数）一次性追加到原智能体，照常经过近重复检测、
+    倒排索引和保留策略；随后清空副本的经验存储，重复执行不会重复合并。
+    remove_replicas 时合并后删除副本目录。
+    """
+    import shutil
+    import experience_logger
+    
+    if not get_agent_path(agent_id, base_path).exists():
+        return {"error": f"智能体 {agent_id} 不存在"}
+    
+    merged = {}
+    total = {"flushed": 0, "duplicates": 0}
+    for replica_id in list_replicas(agent_id, base_path):
+        replica_memory = get_agent_path(replica_id, base_path) / "memory"
+        with store.locked(replica_memory):
+            entries = store.read_entries(replica_memory)
+            if entries:
+                result = experience_logger.append_experiences(agent_id, entries, base_path)
+                total["flushed"] += result["flushed"]
+                total["duplicates"] += len(result["duplicates"])
+                # 先写入原智能体再清空副本：中途失败时重新执行只会多计重复，不会丢经验
+                store.compact(replica_memory, lambda remaining: remaining)
+                for derived in (experience_logger.get_experience_file(replica_id, base_path),
+                                replica_memory / "experience.index.sqlite",
+                                replica_memory / "experience.vec"):
+                    try:
+                        derived.unlink()
+                    except FileNotFoundError:
+                        pass
+        merged[replica_id] = len(entries)
+        if remove_replicas:
+            shutil.rmtree(get_agent_path(replica_id, base_path))
+    
+    if remove_replicas and merged:
+        refresh_registry_many(list(merged), base_path)
+    
+    return {
+        "success": True,
+        "agent_id": agent_id,
+        "merged": merged,
+        "appended": total["flushed"] - total["duplicates"],
+        "duplicates": total["duplicates"],
+        "replicas_removed": remove_replicas,
+    }
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须是正整数: {value}")
+    return number
+
+
 def main():
     parser = argparse.ArgumentParser(description="智能体集群配置管理")
-    parser.add_argument("action", choices=["list", "show", "add", "remove", "update"])
+    parser.add_argument("action", choices=["list", "show", "add", "add-many", "remove", "restore", "backups", "prune", "update", "clone", "merge-memory"])
     parser.add_argument("agent_id", nargs="?", help="智能体 ID")
     parser.add_argument("--base-path", default=DEFAULT_AGENTS_PATH, help="智能体目录")
     parser.add_argument("--template", default="default", help="模板 (default/researcher/coder/writer)")
     parser.add_argument("--name", help="智能体名称")
     parser.add_argument("--emoji", help="智能体 emoji")
     parser.add_argument("--no-backup", action="store_true", help="删除时不备份")
+    parser.add_argument("--backup-dir", help="备份库目录（默认为 <base-path>-backups）")
+    parser.add_argument("--snapshot", help="restore 时使用的快照（默认最新）")
+    parser.add_argument("--keep", type=int, default=agent_backup.DEFAULT_KEEP, help="每个智能体保留的快照数")
+    parser.add_argument("--max-age-days", type=float, help="prune 时同时删除早于该天数的快照（最新的始终保留）")
+    parser.add_argument("--fields", default=",".join(SHOW_FIELDS),
+                        help="show 时输出的字段，逗号分隔 (files/soul/experience)")
+    parser.add_argument("--soul-bytes", type=int, default=SOUL_PREVIEW_BYTES, help="show 时 SOUL.md 预览的字节数")
+    parser.add_argument("--page", type=_positive_int, default=1, help="show 时经验的页码（从新到旧，从 1 开始）")
+    parser.add_argument("--page-size", type=_positive_int, default=EXPERIENCE_PAGE_SIZE, help="show 时每页经验条数")
+    parser.add_argument("--manifest", help="批量添加的清单文件（add-many 时使用，.json / .yaml）")
+    parser.add_argument("--workers", type=_positive_int, default=8, help="add-many 的并行线程数")
+    parser.add_argument("--count", type=_positive_int, default=1, help="clone 时创建的副本数")
+    parser.add_argument("--remove-replicas", action="store_true", help="merge-memory 后删除副本")
+    parser.add_argument("--rescan", action="store_true", help="list 时忽略清单缓存，全部重新扫描")
     
     args = parser.parse_args()
     
     if args.action == "list":
-        agents = list_agents(args.base_path)
+        agents = list_agents(args.base_path, rescan=args.rescan)
         print(f"\n📋 智能体列表 ({len(agents)} 个)\n")
         for a in agents:
             status = "✅" if a.get("has_soul") else "⚠️"
@@ -279,7 +816,13 @@ def main():
         if not args.agent_id:
             print("错误: 需要指定 agent_id")
             return
-        result = show_agent(args.agent_id, args.base_path)
+        fields = tuple(f.strip() for f in args.fields.split(",") if f.strip())
+        unknown = [f for f in fields if f not in SHOW_FIELDS]
+        if unknown:
+            print(f"错误: 未知字段 {', '.join(unknown)}（可选: {', '.join(SHOW_FIELDS)}）")
+            return
+        result = show_agent(args.agent_id, args.base_path, fields=fields, soul_bytes=args.soul_bytes,
+                            page=args.page, page_size=args.page_size)
         print(json.dumps(result, indent=2, ensure_ascii=False))
     
     elif args.action == "add":
@@ -294,11 +837,44 @@ def main():
         result = add_agent(args.agent_id, args.template, args.base_path, **kwargs)
         print(json.dumps(result, indent=2, ensure_ascii=False))
     
+    elif args.action == "add-many":
+        if not args.manifest:
+            print("错误: add-many 需要指定 --manifest")
+            return
+        try:
+            specs = load_manifest(args.manifest)
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法读取清单: {e}")
+            return
+        result = add_many(specs, args.base_path, workers=args.workers)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    
     elif args.action == "remove":
         if not args.agent_id:
             print("错误: 需要指定 agent_id")
             return
-        result = remove_agent(args.agent_id, args.base_path, backup=not args.no_backup)
+        result = remove_agent(args.agent_id, args.base_path, backup=not args.no_backup,
+                              backup_dir=args.backup_dir, keep=args.keep)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    
+    elif args.action == "restore":
+        if not args.agent_id:
+            print("错误: 需要指定 agent_id")
+            return
+        result = restore_agent(args.agent_id, args.base_path, snapshot=args.snapshot,
+                               backup_dir=args.backup_dir)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    
+    elif args.action == "backups":
+        store_dir = Path(args.backup_dir) if args.backup_dir else agent_backup.default_backup_dir(args.base_path)
+        result = agent_backup.store_stats(store_dir)
+        result["list"] = agent_backup.list_snapshots(store_dir, args.agent_id)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    
+    elif args.action == "prune":
+        store_dir = Path(args.backup_dir) if args.backup_dir else agent_backup.default_backup_dir(args.base_path)
+        result = agent_backup.prune(store_dir, keep=args.keep, max_age_days=args.max_age_days,
+                                    agent_id=args.agent_id)
         print(json.dumps(result, indent=2, ensure_ascii=False))
     
     elif args.action == "update":
@@ -313,6 +889,21 @@ def main():
         result = update_agent(args.agent_id, args.base_path, **kwargs)
         print(json.dumps(result, indent=2, ensure_ascii=False))
 
+    
+    elif args.action == "clone":
+        if not args.agent_id:
+            print("错误: 需要指定 agent_id")
+            return
+        result = clone_agent(args.agent_id, args.count, args.base_path)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    
+    elif args.action == "merge-memory":
+        if not args.agent_id:
+            print("错误: 需要指定 agent_id")
+            return
+        result = merge_memory(args.agent_id, args.base_path, remove_replicas=args.remove_replicas)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+
 
 if __name__ == "__main__":
     main()
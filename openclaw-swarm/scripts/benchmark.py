@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Agent Swarm 脚本性能基准
+
+用法:
+    python benchmark.py stress [--writers 32] [--per-writer 10]   # 并发写入经验，校验无丢失
+    python benchmark.py tail [--sizes 50,10000,1000000]           # show --limit 5 的耗时/内存随总条数的变化
+    python benchmark.py startup [--runs 20]                       # swarm_entry.py 各操作的启动耗时与导入耗时
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import statistics
+import subprocess
+import multiprocessing as mp
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+
+def _distinct_text(seed: int, length: int = 24) -> str:
+    """生成互不相似的随机中文文本（避免被近重复检测合并）"""
+    rng = random.Random(seed)
+    return "".join(chr(0x4E00 + rng.randrange(20000)) for _ in range(length))
+
+
+def _stress_writer(base_path: str, agent_id: str, writer: int, per_writer: int, barrier, results):
+    import experience_logger
+
+    barrier.wait()
+    ids = []
+    flushes = 0
+    for i in range(per_writer):
+        content = _distinct_text(writer * per_writer + i)
+        new_exp = experience_logger.new_entry(content, task=f"stress-{writer}")
+        result = experience_logger.append_experiences(agent_id, [new_exp], base_path)
+        ids.append(new_exp["id"])
+        flushes += 1 if result["flushed"] else 0
+    results.put({"ids": ids, "flushes": flushes})
+
+
+def run_stress(writers: int = 32, per_writer: int = 10, base_path: str = None) -> dict:
+    """多个进程同时向同一智能体写入经验，校验存储、索引、Markdown 均无丢失"""
+    import experience_store as store
+    import experience_index
+    from experience_logger import get_memory_dir, get_experience_file, set_retention
+
+    own_tmp = base_path is None
+    base_path = base_path or tempfile.mkdtemp(prefix="swarm-stress-")
+    agent_id = "stress"
+    expected_total = writers * per_writer
+    set_retention(agent_id, capacity=expected_total, base_path=base_path)
+
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(writers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_stress_writer,
+                    args=(base_path, agent_id, w, per_writer, barrier, results))
+        for w in range(writers)
+    ]
+
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    expected_ids = {i for r in collected for i in r["ids"]}
+    memory_dir = get_memory_dir(agent_id, base_path)
+    stored = [e["id"] for e in store.read_entries(memory_dir)]
+    conn = experience_index.connect(memory_dir)
+    indexed = experience_index.doc_count(conn)
+    conn.close()
+    md_lines = sum(1 for line in get_experience_file(agent_id, base_path).read_text().splitlines()
+                   if line.startswith("- ["))
+
+    report = {
+        "writers": writers,
+        "per_writer": per_writer,
+        "expected": expected_total,
+        "stored": len(stored),
+        "unique_stored": len(set(stored)),
+        "lost": len(expected_ids - set(stored)),
+        "indexed": indexed,
+        "markdown_lines": md_lines,
+        "offset_index_entries": store.count_entries(memory_dir),
+        "flushes": sum(r["flushes"] for r in collected),
+        "elapsed_sec": round(elapsed, 3),
+        "entries_per_sec": round(expected_total / elapsed, 1) if elapsed else None,
+    }
+    report["ok"] = (
+        report["lost"] == 0
+        and report["stored"] == report["unique_stored"] == expected_total
+        and indexed == md_lines == report["offset_index_entries"] == expected_total
+    )
+
+    if own_tmp:
+        shutil.rmtree(base_path, ignore_errors=True)
+    return report
+
+
+def run_tail(sizes: list, limit: int = 5, base_path: str = None) -> list:
+    """不同存储规模下读取最近 N 条 / 生成摘要的耗时与峰值内存"""
+    import tracemalloc
+    from pathlib import Path
+    import experience_store as store
+    import experience_logger
+
+    own_tmp = base_path is None
+    base_path = base_path or tempfile.mkdtemp(prefix="swarm-tail-")
+    rows = []
+    for size in sizes:
+        agent_id = f"tail-{size}"
+        memory_dir = Path(base_path) / agent_id / "memory"
+        for start in range(0, size, 10000):
+            batch = [experience_logger.new_entry(f"经验 {i}", category=f"c{i % 8}")
+                     for i in range(start, min(start + 10000, size))]
+            store.append_entries(memory_dir, batch)
+
+        row = {"entries": size}
+        for name, fn in [
+            ("show", lambda: experience_logger.show_experiences(agent_id, limit, base_path)),
+            ("summary", lambda: experience_logger.generate_summary(agent_id, base_path)),
+        ]:
+            fn()  # 预热（首次可能重建汇总）
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            row[f"{name}_ms"] = round(elapsed * 1000, 3)
+            row[f"{name}_peak_kb"] = round(peak / 1024, 1)
+        rows.append(row)
+
+    if own_tmp:
+        shutil.rmtree(base_path, ignore_errors=True)
+    return rows
+
+
+def _import_ms(stderr: str) -> float:
+    """-X importtime 输出中顶层导入的累计耗时（毫秒）"""
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith("  "):
+            total += int(parts[1])
+    return round(total / 1000, 2)
+
+
+def run_startup(runs: int = 20) -> list:
+    """
+    swarm_entry.py 各操作的冷启动耗时
+
+    将脚本复制到临时的技能目录中运行（HOME 也指向临时目录），不影响真实配置。
+    每个场景报告墙钟时间中位数，以及 -X importtime 统计的导入耗时；
+    "interpreter" 为空解释器的基线。
+    """
+    tmp = tempfile.mkdtemp(prefix="swarm-startup-")
+    scripts = os.path.join(tmp, "skill", "scripts")
+    home = os.path.join(tmp, "home")
+    os.makedirs(scripts)
+    os.makedirs(os.path.join(home, ".openclaw"))
+    for name in ("swarm_entry.py", "model_cache.py", "model_classifier.py"):
+        shutil.copy(os.path.join(SCRIPT_DIR, name), scripts)
+    with open(os.path.join(home, ".openclaw", "openclaw.json"), "w", encoding="utf-8") as f:
+        json.dump({"models": {"providers": {"demo": {"models": [
+            {"id": "claude-opus-4", "name": "Claude Opus"},
+            {"id": "glm-4", "name": "GLM-4"},
+        ]}}}}, f)
+    entry = os.path.join(scripts, "swarm_entry.py")
+    status_file = os.path.join(tmp, "skill", ".swarm-status")
+    env = dict(os.environ, HOME=home)
+
+    def measure(name, args, setup=None):
+        walls = []
+        for _ in range(runs):
+            if setup:
+                setup()
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable] + args, env=env, stdout=subprocess.DEVNULL, check=True)
+            walls.append((time.perf_counter() - t0) * 1000)
+        if setup:
+            setup()
+        proc = subprocess.run([sys.executable, "-X", "importtime"] + args, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        return {"action": name, "wall_ms": round(statistics.median(walls), 2),
+                "import_ms": _import_ms(proc.stderr)}
+
+    def drop_status():
+        if os.path.exists(status_file):
+            os.remove(status_file)
+
+    def reset():
+        subprocess.run([sys.executable, entry, "--action", "reset"], env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+
+    rows = [measure("interpreter", ["-c", "pass"])]
+    reset()
+    rows.append(measure("check need_config (cold)", [entry], setup=drop_status))
+    rows.append(measure("check need_config (fast path)", [entry]))
+    rows.append(measure("init", [entry, "--action", "init"]))
+    rows.append(measure("check ready (cold)", [entry], setup=drop_status))
+    rows.append(measure("check ready (fast path)", [entry]))
+    rows.append(measure("status", [entry, "--action", "status"]))
+    rows.append(measure("reset", [entry, "--action", "reset"]))
+
+    shutil.rmtree(tmp, ignore_errors=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent Swarm 性能基准")
+    parser.add_argument("action", choices=["stress", "tail", "startup"])
+    parser.add_argument("--writers", type=int, default=32, help="并发写入进程数")
+    parser.add_argument("--per-writer", type=int, default=10, help="每个进程写入的经验数")
+    parser.add_argument("--sizes", default="50,10000,1000000", help="规模列表（tail 时使用）")
+    parser.add_argument("--runs", type=int, default=20, help="每个场景的运行次数（startup 时使用）")
+    parser.add_argument("--base-path", help="测试目录（默认使用临时目录并在结束后删除）")
+
+    args = parser.parse_args()
+
+    if args.action == "stress":
+        report = run_stress(args.writers, args.per_writer, args.base_path)
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return 0 if report["ok"] else 1
+
+    if args.action == "tail":
+        rows = run_tail([int(x) for x in args.sizes.split(",")], base_path=args.base_path)
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+        return 0
+
+    if args.action == "startup":
+        print(json.dumps(run_startup(args.runs), indent=2, ensure_ascii=False))
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
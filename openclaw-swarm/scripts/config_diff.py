@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+配置补丁的最小差异
+
+配置向导生成的是期望的 agents.list。与其整体替换（网关会重新加载全部智能体），
+不如与当前 openclaw.json 比较，只输出有变化的部分：
+
+    json-patch  RFC 6902 操作列表。已有智能体按 id 定位，只改动变化的字段，
+                每个按下标定位的智能体前加一条 test（id 不符时整个补丁失败，避免改错对象）；
+                新智能体追加到列表末尾
+    merge       RFC 7396 合并补丁（向导默认，可直接用于 gateway config.patch）。
+                数组只能整体替换，无法按 id 定位智能体，所以只要有一个智能体变化，
+                输出的就是完整的 agents.list：在当前列表上应用改动后的结果
+                （保留向导不管理的智能体和用户添加的字段），无变化时为 {}
+
+只比较向导生成的字段（id、model、identity 等）：期望值中出现的键新增或替换，
+当前配置中多出的键保留（例如用户在 identity 下添加的字段）；只有 MANAGED_KEYS 中
+由向导维护、这次不再生成的键会被删除（例如模型池缩小为 1 时的 model.fallbacks）。
+向导未设置的字段、以及向导不管理的智能体保持不变。
+
+用法:
+    python config_diff.py apply config-patch.json ~/.openclaw/openclaw.json [--in-place]
+"""
+
+import os
+import sys
+import copy
+import json
+import argparse
+
+# 向导维护的可选字段（相对智能体的键路径）：期望值中没有时从当前配置删除
+MANAGED_KEYS = {("model", "fallbacks")}
+
+
+def _escape(token) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def pointer(*tokens) -> str:
+    return "".join(f"/{_escape(t)}" for t in tokens)
+
+
+def diff_values(old, new, path: str, keys: tuple = ()) -> list:
+    """
+    old → new 的 RFC 6902 操作（对象逐键比较，其他类型不等时整体替换）
+
+    keys 为 path 相对智能体的键路径；old 中多出的键只有在 MANAGED_KEYS 中时才删除。
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new and keys + (key,) in MANAGED_KEYS:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+            else:
+                ops.extend(diff_values(old[key], value, f"{path}/{_escape(key)}", keys + (key,)))
+        return ops
+    if old != new or type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    return []
+
+
+def diff_agents(config: dict, desired: list) -> tuple:
+    """
+    当前配置的 agents.list 到期望列表的最小 RFC 6902 补丁
+
+    返回 (操作列表, 摘要)。期望列表中每个智能体只比较其中出现的字段。
+    """
+    agents = (config or {}).get("agents")
+    current = agents.get("list") if isinstance(agents, dict) else None
+
+    if not isinstance(agents, dict):
+        ops = [{"op": "add", "path": "/agents", "value": {"list": desired}}]
+        return ops, summarize(ops, added=[a["id"] for a in desired], changed=[], unchanged=0)
+    if not isinstance(current, list):
+        ops = [{"op": "add", "path": "/agents/list", "value": desired}]
+        return ops, summarize(ops, added=[a["id"] for a in desired], changed=[], unchanged=0)
+
+    index = {}
+    for i, agent in enumerate(current):
+        if isinstance(agent, dict):
+            index.setdefault(agent.get("id"), i)
+
+    ops = []
+    added, changed, unchanged = [], [], 0
+    for agent in desired:
+        i = index.get(agent["id"])
+        if i is None:
+            ops.append({"op": "add", "path": pointer("agents", "list", "-"), "value": agent})
+            added.append(agent["id"])
+            continue
+        base = pointer("agents", "list", i)
+        agent_ops = []
+        for key, value in agent.items():
+            if key not in current[i]:
+                agent_ops.append({"op": "add", "path": f"{base}/{_escape(key)}", "value": value})
+            else:
+                agent_ops.extend(diff_values(current[i][key], value, f"{base}/{_escape(key)}", (key,)))
+        if agent_ops:
+            ops.append({"op": "test", "path": f"{base}/id", "value": agent["id"]})
+            ops.extend(agent_ops)
+            changed.append(agent["id"])
+        else:
+            unchanged += 1
+    return ops, summarize(ops, added, changed, unchanged)
+
+
+def summarize(ops: list, added: list, changed: list, unchanged: int) -> dict:
+    by_op = {}
+    for op in ops:
+        by_op[op["op"]] = by_op.get(op["op"], 0) + 1
+    return {
+        "operations": len(ops),
+        "by_op": by_op,
+        "agents_added": added,
+        "agents_changed": changed,
+        "agents_unchanged": unchanged,
+    }
+
+
+def _resolve(doc, path: str):
+    """返回 (父容器, 最后一级的键 / 下标)"""
+    tokens = [_unescape(t) for t in path.split("/")[1:]]
+    parent = doc
+    for token in tokens[:-1]:
+        parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+    last = tokens[-1]
+    if isinstance(parent, list) and last != "-":
+        last = int(last)
+    return parent, last
+
+
+def apply_patch(doc, ops: list):
+    """应用 RFC 6902 补丁（支持 add / remove / replace / test），返回新文档，不修改原对象"""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        parent, key = _resolve(doc, op["path"])
+        kind = op["op"]
+        if kind == "test":
+            if parent[key] != op["value"]:
+                raise ValueError(f"test 失败: {op['path']}")
+        elif kind == "add":
+            if isinstance(parent, list):
+                parent.insert(len(parent) if key == "-" else key, copy.deepcopy(op["value"]))
+            else:
+                parent[key] = copy.deepcopy(op["value"])
+        elif kind == "replace":
+            parent[key]  # 目标必须存在
+            parent[key] = copy.deepcopy(op["value"])
+        elif kind == "remove":
+            del parent[key]
+        else:
+            raise ValueError(f"不支持的操作: {kind}")
+    return doc
+
+
+def merge_patch(config: dict, ops: list) -> dict:
+    """与 RFC 6902 操作等价的 RFC 7396 合并补丁（无变化时为 {}）"""
+    if not ops:
+        return {}
+    updated = apply_patch(config or {}, ops)
+    return {"agents": {"list": updated["agents"]["list"]}}
+
+
+def apply_merge_patch(target, patch):
+    """应用 RFC 7396 合并补丁，返回新文档"""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = copy.deepcopy(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用配置向导生成的补丁")
+    parser.add_argument("action", choices=["apply"])
+    parser.add_argument("patch", help="补丁文件（RFC 6902 操作列表或 RFC 7396 合并补丁）")
+    parser.add_argument("config", help="openclaw.json")
+    parser.add_argument("--in-place", action="store_true", help="直接写回配置文件（默认输出到标准输出）")
+    args = parser.parse_args()
+
+    with open(args.patch, "r", encoding="utf-8") as f:
+        patch = json.load(f)
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    try:
+        result = apply_patch(config, patch) if isinstance(patch, list) else apply_merge_patch(config, patch)
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        print(json.dumps({"error": f"补丁无法应用: {e}"}, ensure_ascii=False))
+        return 1
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.in_place:
+        tmp = f"{args.config}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        os.replace(tmp, args.config)
+        print(json.dumps({"applied": args.config}, ensure_ascii=False))
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+经验冷归档
+
+被保留策略淘汰的经验不再删除，而是写入 memory/archive/ 下的压缩分段：
+
+    archive/seg-000001.jsonl.gz   每次淘汰生成一个分段，写入后不再修改
+    archive/index.json            分段索引：条数、时间范围、词项布隆过滤器
+
+热存储（experience.jsonl）保持小而快；检索冷数据时先用布隆过滤器跳过
+不含查询词的分段，再逐行流式解压命中的分段，内存只与结果数量相关。
+"""
+
+import json
+import gzip
+import math
+import heapq
+import hashlib
+from pathlib import Path
+from collections import Counter
+
+import experience_store as store
+from experience_index import tokenize, entry_text, K1, B
+
+ARCHIVE_DIR = "archive"
+INDEX_NAME = "index.json"
+
+BLOOM_BITS_PER_TERM = 10
+BLOOM_HASHES = 7
+
+
+def archive_dir(memory_dir: Path) -> Path:
+    return memory_dir / ARCHIVE_DIR
+
+
+def load_index(memory_dir: Path) -> dict:
+    try:
+        return json.loads((archive_dir(memory_dir) / INDEX_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {"segments": []}
+
+
+def _bloom_positions(term: str, bits: int) -> list:
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % bits for i in range(BLOOM_HASHES)]
+
+
+def _build_bloom(terms: set) -> tuple:
+    bits = max(64, len(terms) * BLOOM_BITS_PER_TERM)
+    bloom = 0
+    for term in terms:
+        for pos in _bloom_positions(term, bits):
+            bloom |= 1 << pos
+    return bits, f"{bloom:x}"
+
+
+def segment_may_contain(segment: dict, terms: set) -> bool:
+    """布隆过滤器判断分段是否可能包含任一查询词（不会漏判）"""
+    bloom = int(segment["bloom"], 16)
+    bits = segment["bloom_bits"]
+    return any(all(bloom >> pos & 1 for pos in _bloom_positions(term, bits)) for term in terms)
+
+
+def archive_entries(memory_dir: Path, entries: list) -> dict:
+    """将一批淘汰的经验写成新的不可变分段（须持有存储锁），返回分段信息"""
+    if not entries:
+        return None
+
+    folder = archive_dir(memory_dir)
+    created = not folder.exists()
+    folder.mkdir(parents=True, exist_ok=True)
+    index = load_index(memory_dir)
+    seq = index["segments"][-1]["seq"] + 1 if index["segments"] else 1
+    name = f"seg-{seq:06d}.jsonl.gz"
+
+    terms = set()
+    length = 0
+    lines = []
+    for entry in entries:
+        tokens = tokenize(entry_text(entry))
+        terms.update(tokens)
+        length += len(tokens)
+        lines.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+    data = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"), mtime=0)
+    store.write_bytes_atomic(folder / name, data)
+
+    bloom_bits, bloom = _build_bloom(terms)
+    created = sorted(e.get("created") or "" for e in entries)
+    segment = {
+        "seq": seq,
+        "name": name,
+        "count": len(entries),
+        "length": length,
+        "first_created": created[0],
+        "last_created": created[-1],
+        "bytes": len(data),
+        "bloom_bits": bloom_bits,
+        "bloom": bloom,
+    }
+    index["segments"].append(segment)
+    store.write_text_atomic(folder / INDEX_NAME, json.dumps(index, ensure_ascii=False))
+    store.fsync_dir(folder)
+    if created:
+        store.fsync_dir(memory_dir)
+    return segment
+
+
+def iter_segment(memory_dir: Path, segment: dict):
+    """流式读取一个分段中的经验"""
+    with gzip.open(archive_dir(memory_dir) / segment["name"], "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def recent_archived(memory_dir: Path, limit: int = 10) -> list:
+    """
+    最近创建的 N 条归档经验，按时间顺序返回
+
+    分段顺序是淘汰顺序（lfu / decayed 策略下不等于创建顺序），所以按 created 取前 N 条：
+    分段按 last_created 从新到旧读取，已够 N 条且分段内最新的经验也不比第 N 条新时停止。
+    """
+    if limit <= 0:
+        return []
+    segments = sorted(load_index(memory_dir)["segments"],
+                      key=lambda s: s.get("last_created") or "", reverse=True)
+    top = []  # 小顶堆 (created, 分段序号, 行号, 经验)
+    for segment in segments:
+        if len(top) >= limit and (segment.get("last_created") or "") <= top[0][0]:
+            break
+        for i, entry in enumerate(iter_segment(memory_dir, segment)):
+            item = (entry.get("created") or "", segment["seq"], i, entry)
+            if len(top) < limit:
+                heapq.heappush(top, item)
+            elif item[:3] > top[0][:3]:
+                heapq.heapreplace(top, item)
+    return [item[3] for item in sorted(top, key=lambda item: item[:3])]
+
+
+def search_archive(memory_dir: Path, query: str, limit: int = 5) -> list:
+    """
+    在冷归档中按 BM25 检索，返回 [(score, entry), ...]
+
+    IDF 与平均长度按所有分段的汇总统计计算；文档频率在命中分段内现场统计。
+    """
+    terms = set(tokenize(query))
+    segments = load_index(memory_dir)["segments"]
+    if not terms or not segments:
+        return []
+
+    n_docs = sum(s["count"] for s in segments)
+    avg_len = sum(s.get("length", 0) for s in segments) / n_docs or 1.0
+
+    candidates = [s for s in segments if segment_may_contain(s, terms)]
+
+    # 第一遍：统计查询词的文档频率
+    df = Counter()
+    for segment in candidates:
+        for entry in iter_segment(memory_dir, segment):
+            df.update(terms.intersection(tokenize(entry_text(entry))))
+    if not df:
+        return []
+
+    # 第二遍：打分，只保留前 N 名
+    top = []
+    seq = 0
+    for segment in candidates:
+        for entry in iter_segment(memory_dir, segment):
+            tokens = tokenize(entry_text(entry))
+            tf = Counter(t for t in tokens if t in df)
+            if not tf:
+                continue
+            norm = K1 * (1 - B + B * len(tokens) / avg_len)
+            score = sum(
+                math.log(1 + (n_docs - df[t] + 0.5) / (df[t] + 0.5)) * n * (K1 + 1) / (n + norm)
+                for t, n in tf.items()
+            )
+            seq += 1
+            item = (score, seq, entry)
+            if len(top) < limit:
+                heapq.heappush(top, item)
+            elif item > top[0]:
+                heapq.heapreplace(top, item)
+    return [(score, entry) for score, _, entry in sorted(top, reverse=True)]
+
+
+def archive_stats(memory_dir: Path) -> dict:
+    segments = load_index(memory_dir)["segments"]
+    return {
+        "segments": len(segments),
+        "entries": sum(s["count"] for s in segments),
+        "bytes": sum(s["bytes"] for s in segments),
+        # 分段顺序是淘汰顺序，不一定是创建顺序
+        "first_created": min((s["first_created"] for s in segments), default=None),
+        "last_created": max((s["last_created"] for s in segments), default=None),
+    }
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+跨智能体的全局经验索引
+
+索引保存在 <base>/.experience-index.sqlite（以 . 开头，list_agents 会跳过），
+结构与单个智能体的 BM25 索引相同，文档 ID 为 "<agent_id>/<exp_id>"。
+
+每次检索前按各智能体 memory/experience.idx 的 (inode, 大小, mtime) 判断是否有变化：
+    - 未变化      跳过
+    - 只追加      从上次同步的位置读取新增条目（偏移索引定位）
+    - 被整体重写  （整理、迁移等）按 ID 对比，增删差异部分
+
+原子替换可能复用 inode，所以 inode 相同且变大时还要核对第一条和上次同步的最后一条
+经验的 ID：重写保持条目顺序且 ID 唯一，两端都没变说明已同步的部分原样保留，
+否则按整体重写处理。
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+import experience_store as store
+import experience_index
+
+INDEX_NAME = ".experience-index.sqlite"
+
+AGENTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agents (
+    agent TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    synced INTEGER NOT NULL,
+    first_id TEXT,
+    last_id TEXT
+);
+"""
+
+
+def index_path(base_path: str) -> Path:
+    return Path(base_path) / INDEX_NAME
+
+
+def connect(base_path: str) -> sqlite3.Connection:
+    conn = experience_index.connect_path(index_path(base_path))
+    conn.executescript(AGENTS_SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(agents)")}
+    with conn:
+        for column in ("first_id", "last_id"):
+            if column not in columns:  # 旧版索引：缺失的 ID 为空，下次同步按整体重写处理
+                conn.execute(f"ALTER TABLE agents ADD COLUMN {column} TEXT")
+    return conn
+
+
+def _doc(agent_id: str, entry: dict) -> dict:
+    return dict(entry, id=f"{agent_id}/{entry['id']}", agent_id=agent_id)
+
+
+def _agent_doc_ids(conn: sqlite3.Connection, agent_id: str) -> dict:
+    """该智能体在全局索引中的 {全局 ID: 文档编号}"""
+    prefix = f"{agent_id}/"
+    return dict(conn.execute(
+        "SELECT id, doc FROM docs WHERE id >= ? AND id < ?", (prefix, prefix[:-1] + "0")
+    ).fetchall())
+
+
+def _marker(memory_dir: Path):
+    try:
+        st = os.stat(store.index_path(memory_dir))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _boundary_ids(memory_dir: Path, synced: int) -> tuple:
+    """第一条和第 synced 条经验的 ID（不存在时为 None）"""
+    if synced <= 0:
+        return None, None
+    rows = store.read_rows(memory_dir, [0, synced - 1])
+    return tuple(rows[i].get("id") if i in rows else None for i in (0, synced - 1))
+
+
+def sync_agent(conn: sqlite3.Connection, base_path: str, agent_id: str) -> int:
+    """把单个智能体的变化同步进全局索引，返回变更的条目数"""
+    memory_dir = Path(base_path) / agent_id / "memory"
+    marker = _marker(memory_dir)
+    row = conn.execute(
+        "SELECT inode, size, mtime, synced, first_id, last_id FROM agents WHERE agent = ?", (agent_id,)
+    ).fetchone()
+
+    if marker is None:
+        if row is None:
+            return 0
+        stale = list(_agent_doc_ids(conn, agent_id))
+        experience_index.remove_entries(conn, stale)
+        with conn:
+            conn.execute("DELETE FROM agents WHERE agent = ?", (agent_id,))
+        return len(stale)
+
+    if row is not None and tuple(row[:3]) == marker:
+        return 0
+
+    inode, size, _ = marker
+    if row is not None and row[0] == inode and size >= row[1] \
+            and (row[3] == 0 or _boundary_ids(memory_dir, row[3]) == (row[4], row[5])):
+        # 只追加：从上次同步的位置继续读
+        added = store.read_from(memory_dir, row[3])
+        removed = []
+        synced = row[3] + len(added)
+    else:
+        entries = store.read_entries(memory_dir)
+        known = _agent_doc_ids(conn, agent_id)
+        current = {f"{agent_id}/{e['id']}" for e in entries}
+        added = [e for e in entries if f"{agent_id}/{e['id']}" not in known]
+        removed = [doc_id for doc_id in known if doc_id not in current]
+        synced = len(entries)
+
+    experience_index.remove_entries(conn, removed)
+    experience_index.add_entries(conn, [_doc(agent_id, e) for e in added], signatures=False)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO agents (agent, inode, size, mtime, synced, first_id, last_id)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (agent_id, *marker, synced, *_boundary_ids(memory_dir, synced)),
+        )
+    return len(added) + len(removed)
+
+
+def list_agent_ids(base_path: str) -> list:
+    """有经验存储的智能体（只用 scandir，不读文件）"""
+    base = Path(base_path)
+    if not base.exists():
+        return []
+    agents = []
+    with os.scandir(base) as it:
+        for entry in it:
+            if entry.is_dir() and not entry.name.startswith("."):
+                agents.append(entry.name)
+    return agents
+
+
+def sync(conn: sqlite3.Connection, base_path: str, agents: list = None) -> int:
+    """同步指定（默认全部）智能体，并清理已删除的智能体，返回变更的条目数"""
+    changed = 0
+    targets = agents if agents is not None else list_agent_ids(base_path)
+    for agent_id in targets:
+        changed += sync_agent(conn, base_path, agent_id)
+    if agents is None:
+        present = set(targets)
+        for (agent_id,) in conn.execute("SELECT agent FROM agents").fetchall():
+            if agent_id not in present:
+                changed += sync_agent(conn, base_path, agent_id)
+    return changed
+
+
+def search(base_path: str, query: str, agents: list = None, limit: int = 10) -> dict:
+    """
+    跨智能体检索经验，返回按得分排序的结果（附带来源智能体）
+
+    agents 为 None 时检索所有智能体。
+    """
+    conn = connect(base_path)
+    try:
+        changed = sync(conn, base_path, agents)
+        allowed = None
+        if agents is not None:
+            allowed = set()
+            for agent_id in agents:
+                allowed.update(_agent_doc_ids(conn, agent_id).values())
+        hits = experience_index.search(conn, query, limit, allowed=allowed)
+    finally:
+        conn.close()
+
+    results = []
+    for score, payload in hits:
+        agent_id, _, exp_id = payload["id"].partition("/")
+        results.append(dict(payload, id=exp_id, agent_id=agent_id, score=round(score, 4)))
+    return {"query": query, "synced": changed, "results": results}
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+经验倒排索引（BM25）
+
+索引保存在 memory/experience.index.sqlite，与经验存储放在一起，
+由 log_experience 增量更新。完全离线，仅依赖标准库 sqlite3。
+
+同一索引中还保存每条经验的 MinHash 签名（32 × 16 位），按 8 段 × 4 行分桶（LSH），
+用于写入时的近重复检测：只查 8 个桶，再用签名估算 Jaccard 相似度确认，
+耗时与总条数无关。短文本上 MinHash 比 SimHash 稳定（改一个字 SimHash 距离就可能超过阈值）。
+
+分词规则:
+    - 英文/数字按单词切分并转小写
+    - 中日韩文字连续片段切成单字 + 相邻二字组（bigram）
+"""
+
+import re
+import json
+import math
+import heapq
+import sqlite3
+import struct
+import hashlib
+from pathlib import Path
+from collections import Counter
+
+INDEX_NAME = "experience.index.sqlite"
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(
+    r"[a-z0-9_]+"
+    r"|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    length INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (term, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS signatures (
+    doc INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS buckets_doc ON buckets (doc);
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# MinHash 近重复检测参数（Jaccard ≈ 0.6 以上的才可能落入同一桶）
+MINHASH_SIZE = 32
+MINHASH_BANDS = 8
+MINHASH_ROWS = MINHASH_SIZE // MINHASH_BANDS
+NEAR_DUPLICATE_JACCARD = 0.7
+
+_MERSENNE = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(b"a%d" % i, digest_size=8).digest(), "little") % (_MERSENNE - 1) + 1,
+     int.from_bytes(hashlib.blake2b(b"b%d" % i, digest_size=8).digest(), "little") % _MERSENNE)
+    for i in range(MINHASH_SIZE)
+]
+_SIGNATURE = struct.Struct(f"<{MINHASH_SIZE}H")
+
+# 写入索引的字段（检索结果直接从索引返回，无需回读存储）
+PAYLOAD_FIELDS = ("id", "agent_id", "content", "task", "category", "created", "tokens")
+
+
+def tokenize(text: str) -> list:
+    """分词：英文按单词，CJK 输出单字和二字组"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if run[0].isascii():
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def entry_text(entry: dict) -> str:
+    """参与检索的文本：经验内容 + 来源任务 + 类别"""
+    return " ".join(filter(None, [entry.get("content"), entry.get("task"), entry.get("category")]))
+
+
+def minhash(text: str) -> bytes:
+    """MinHash 签名（特征为分词结果去重），空文本返回 None"""
+    features = {
+        int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        for token in tokenize(text)
+    }
+    if not features:
+        return None
+    return _SIGNATURE.pack(*(
+        min((a * x + b) % _MERSENNE for x in features) & 0xFFFF
+        for a, b in _PERMUTATIONS
+    ))
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """由两个签名估算 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(_SIGNATURE.unpack(a), _SIGNATURE.unpack(b))) / MINHASH_SIZE
+
+
+def _bands(signature: bytes) -> list:
+    width = MINHASH_ROWS * 2
+    return [
+        (band, int.from_bytes(hashlib.blake2b(signature[band * width:(band + 1) * width],
+                                              digest_size=8).digest(), "little", signed=True))
+        for band in range(MINHASH_BANDS)
+    ]
+
+
+def find_near_duplicate(conn: sqlite3.Connection, signature: bytes,
+                        threshold: float = NEAR_DUPLICATE_JACCARD):
+    """查找与签名相似度 ≥ threshold 的已有经验，返回其 ID（没有则为 None）"""
+    if signature is None:
+        return None
+    best = None
+    checked = set()
+    for band, bucket in _bands(signature):
+        for (doc,) in conn.execute(
+            "SELECT doc FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+        ):
+            if doc in checked:
+                continue
+            checked.add(doc)
+            row = conn.execute("SELECT signature FROM signatures WHERE doc = ?", (doc,)).fetchone()
+            score = similarity(signature, row[0])
+            if score >= threshold and (best is None or score > best[0]):
+                best = (score, doc)
+    if best is None:
+        return None
+    row = conn.execute("SELECT id FROM docs WHERE doc = ?", (best[1],)).fetchone()
+    return row[0] if row else None
+
+
+def index_path(memory_dir: Path) -> Path:
+    return memory_dir / INDEX_NAME
+
+
+def connect(memory_dir: Path) -> sqlite3.Connection:
+    memory_dir.mkdir(parents=True, exist_ok=True)
+    return connect_path(index_path(memory_dir))
+
+
+def connect_path(path: Path) -> sqlite3.Connection:
+    """打开（必要时创建）指定路径的索引库"""
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _bump_stats(conn: sqlite3.Connection, docs: int, length: int):
+    conn.executemany(
+        "INSERT INTO stats (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+        [("docs", docs), ("length", length)],
+    )
+
+
+def add_entries(conn: sqlite3.Connection, entries: list, signatures: bool = True):
+    """增量加入若干条经验（已存在的 ID 会被忽略），signatures=False 时不写近重复签名"""
+    added_docs = 0
+    added_length = 0
+    with conn:
+        for entry in entries:
+            terms = Counter(tokenize(entry_text(entry)))
+            length = sum(terms.values())
+            payload = json.dumps({k: entry.get(k) for k in PAYLOAD_FIELDS}, ensure_ascii=False)
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO docs (id, length, payload) VALUES (?, ?, ?)",
+                (entry["id"], length, payload),
+            )
+            if not cur.rowcount:
+                continue
+            doc = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO postings (term, doc, tf, length) VALUES (?, ?, ?, ?)",
+                [(term, doc, tf, length) for term, tf in terms.items()],
+            )
+            signature = minhash(entry.get("content")) if signatures else None
+            if signature is not None:
+                conn.execute("INSERT INTO signatures (doc, signature) VALUES (?, ?)", (doc, signature))
+                conn.executemany(
+                    "INSERT INTO buckets (band, bucket, doc) VALUES (?, ?, ?)",
+                    [(band, bucket, doc) for band, bucket in _bands(signature)],
+                )
+            conn.executemany(
+                "INSERT INTO terms (term, df) VALUES (?, 1) "
+                "ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                [(term,) for term in terms],
+            )
+            added_docs += 1
+            added_length += length
+        _bump_stats(conn, added_docs, added_length)
+
+
+def remove_entries(conn: sqlite3.Connection, ids: list):
+    """从索引中移除若干条经验"""
+    removed_docs = 0
+    removed_length = 0
+    with conn:
+        for exp_id in ids:
+            row = conn.execute("SELECT doc, length FROM docs WHERE id = ?", (exp_id,)).fetchone()
+            if not row:
+                continue
+            conn.execute(
+                "UPDATE terms SET df = df - 1 WHERE term IN (SELECT term FROM postings WHERE doc = ?)",
+                (row[0],),
+            )
+            conn.execute("DELETE FROM postings WHERE doc = ?", (row[0],))
+            conn.execute("DELETE FROM signatures WHERE doc = ?", (row[0],))
+            conn.execute("DELETE FROM buckets WHERE doc = ?", (row[0],))
+            conn.execute("DELETE FROM docs WHERE doc = ?", (row[0],))
+            removed_docs += 1
+            removed_length += row[1]
+        _bump_stats(conn, -removed_docs, -removed_length)
+
+
+def rebuild(conn: sqlite3.Connection, entries: list):
+    """清空并按给定经验重建索引"""
+    with conn:
+        conn.execute("DELETE FROM postings")
+        conn.execute("DELETE FROM terms")
+        conn.execute("DELETE FROM signatures")
+        conn.execute("DELETE FROM buckets")
+        conn.execute("DELETE FROM docs")
+        conn.execute("DELETE FROM stats")
+    add_entries(conn, entries)
+
+
+def known_ids(conn: sqlite3.Connection, ids: list) -> set:
+    """ids 中已被索引的经验 ID"""
+    return {exp_id for exp_id in set(ids)
+            if conn.execute("SELECT 1 FROM docs WHERE id = ?", (exp_id,)).fetchone()}
+
+
+def doc_count(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM stats WHERE key = 'docs'").fetchone()
+    return row[0] if row else 0
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 5, allowed: set = None) -> list:
+    """
+    BM25 检索，返回 [(score, payload), ...]，按得分从高到低
+
+    allowed 为可选的文档编号集合，只在其中检索。
+
+    按 MaxScore 策略处理查询词：先按 IDF 从高到低读取稀有词的倒排表；
+    当剩余高频词的得分上界已不足以让新文档进入前 N 名时，
+    这些词只回查现有候选文档，不再扫描整张倒排表。
+    """
+    terms = set(tokenize(query))
+    if not terms or limit <= 0:
+        return []
+
+    stats = dict(conn.execute("SELECT key, value FROM stats").fetchall())
+    n_docs = stats.get("docs", 0)
+    if not n_docs:
+        return []
+    avg_len = stats.get("length", 0) / n_docs or 1.0
+
+    placeholders = ",".join("?" * len(terms))
+    dfs = conn.execute(
+        f"SELECT term, df FROM terms WHERE df > 0 AND term IN ({placeholders})", tuple(terms)
+    ).fetchall()
+    weighted = sorted(
+        ((math.log(1 + (n_docs - df + 0.5) / (df + 0.5)), term) for term, df in dfs),
+        reverse=True,
+    )
+    # 每个词对单篇文档的得分上界为 idf * (K1 + 1)
+    remaining = [0.0] * (len(weighted) + 1)
+    for i in range(len(weighted) - 1, -1, -1):
+        remaining[i] = remaining[i + 1] + weighted[i][0] * (K1 + 1)
+
+    scores = Counter()
+    for i, (idf, term) in enumerate(weighted):
+        threshold = heapq.nlargest(limit, scores.values())[-1] if len(scores) >= limit else 0.0
+        if remaining[i] > threshold:
+            postings = conn.execute(
+                "SELECT doc, tf, length FROM postings WHERE term = ?", (term,)
+            ).fetchall()
+        else:
+            # 剩余词不可能让新文档进入前 N 名，只更新仍有机会的候选
+            candidates = [doc for doc, score in scores.items() if score + remaining[i] > threshold]
+            if not candidates:
+                break
+            postings = []
+            for start in range(0, len(candidates), 500):
+                chunk = candidates[start:start + 500]
+                postings.extend(conn.execute(
+                    f"SELECT doc, tf, length FROM postings WHERE term = ? "
+                    f"AND doc IN ({','.join('?' * len(chunk))})", (term, *chunk)
+                ).fetchall())
+        if allowed is not None:
+            postings = [p for p in postings if p[0] in allowed]
+        for doc, tf, length in postings:
+            norm = K1 * (1 - B + B * length / avg_len)
+            scores[doc] += idf * tf * (K1 + 1) / (tf + norm)
+
+    # 同分时优先较新的经验（doc 自增）
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+    results = []
+    for doc, score in top:
+        row = conn.execute("SELECT payload FROM docs WHERE doc = ?", (doc,)).fetchone()
+        results.append((score, json.loads(row[0])))
+    return results
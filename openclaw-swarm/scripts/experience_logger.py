@@ -6,188 +6,571 @@
 
 用法:
     python experience_logger.py log <agent_id> "经验描述" --task "任务名称"
+    python experience_logger.py log-batch --file experiences.jsonl  # 批量记录（省略 --file 时读 stdin）
     python experience_logger.py show <agent_id>
     python experience_logger.py summary <agent_id>  # 生成经验摘要
     python experience_logger.py inject <agent_id>   # 输出可注入到 prompt 的经验
+    python experience_logger.py inject <agent_id> --query "任务描述"  # 按相关度（BM25）选取经验
+    python experience_logger.py inject <agent_id> --max-tokens 300   # 限制注入的 token 预算
+    python experience_logger.py mark-used <agent_id> <exp_id> [<exp_id> ...]  # 标记经验已被使用
+    python experience_logger.py retention <agent_id> --policy lfu --capacity 500  # 设置保留策略
+    python experience_logger.py archive <agent_id>  # 查看冷归档统计（show/inject 加 --archive 可检索归档）
+    python experience_logger.py search "查询内容" [--agents a,b]  # 跨智能体检索经验
+    python experience_logger.py migrate <agent_id>  # 迁移旧版 experience.json
+
+存储格式见 experience_store.py（追加写 experience.jsonl + 偏移索引）。
 """
 
 import os
+import sys
 import json
 import argparse
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+import experience_store as store
+import experience_index
+import experience_retention as retention
+import experience_archive as archive
+import experience_global
+import experience_vectors as vectors
+
 DEFAULT_AGENTS_PATH = "/workspace/agents"
-MAX_EXPERIENCES = 50  # 每个智能体最多保留的经验数
+MAX_EXPERIENCES = 50  # 每个智能体默认保留的经验数（可在 memory/retention.json 中按智能体配置）
+INJECT_HEADER = "## 历史经验（供参考）\n"
+
+
+def get_memory_dir(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> Path:
+    return Path(base_path) / agent_id / "memory"
 
 
 def get_experience_file(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> Path:
-    return Path(base_path) / agent_id / "memory" / "experience.md"
+    return get_memory_dir(agent_id, base_path) / "experience.md"
 
 
 def get_experience_json(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> Path:
-    return Path(base_path) / agent_id / "memory" / "experience.json"
+    """旧版结构化存储（已由 experience.jsonl 取代，仅用于迁移）"""
+    return get_memory_dir(agent_id, base_path) / "experience.json"
 
 
-def log_experience(agent_id: str, experience: str, task: str = None, 
-                   category: str = "general", base_path: str = DEFAULT_AGENTS_PATH) -> dict:
-    """记录一条经验"""
+def append_markdown(agent_id: str, lines: list, base_path: str = DEFAULT_AGENTS_PATH):
+    """
+    将经验写入 experience.md（人类可读）
+
+    与原先一致，新经验插入到 "## 经验记录" 标题之后，文件中从新到旧排列；
+    lines 按时间顺序给出，同一批中最新的排在最前。
+    """
     exp_file = get_experience_file(agent_id, base_path)
-    exp_json = get_experience_json(agent_id, base_path)
-    
-    # 确保目录存在
-    exp_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    # 当前时间
-    now = datetime.now()
-    date_str = now.strftime("%Y-%m-%d")
-    time_str = now.strftime("%H:%M")
-    
-    # 记录到 JSON（结构化）
-    experiences = []
-    if exp_json.exists():
-        try:
-            experiences = json.loads(exp_json.read_text())
-        except:
-            experiences = []
-    
-    new_exp = {
-        "id": f"exp_{now.strftime('%Y%m%d%H%M%S')}",
+    text = "".join(reversed(lines))
+
+    if not exp_file.exists():
+        store.write_text_atomic(exp_file, f"""# 经验记忆 - {agent_id}
+
+*记录执行任务中获得的有效经验*
+
+## 经验记录
+
+{text}""")
+        return
+
+    content = exp_file.read_text()
+    if "## 经验记录" in content:
+        head, _, rest = content.partition("## 经验记录")
+        # 移除 "(暂无记录)" 提示
+        rest = rest.replace("*(暂无记录)*\n", "").replace("*(暂无记录)*", "")
+        content = head + "## 经验记录\n\n" + text + rest.lstrip("\n")
+    else:
+        content = content.rstrip("\n") + "\n\n## 经验记录\n\n" + text
+    store.write_text_atomic(exp_file, content)
+
+
+def format_markdown_line(exp: dict) -> str:
+    task_info = f" ({exp['task']})" if exp.get("task") else ""
+    return f"- [{exp['created'][:10]}] {exp['content']}{task_info}\n"
+
+
+def open_index(memory_dir: Path):
+    """打开倒排索引；与存储条数不一致时（如刚迁移）按存储重建"""
+    conn = experience_index.connect(memory_dir)
+    if experience_index.doc_count(conn) != store.count_entries(memory_dir):
+        with store.locked(memory_dir):
+            experience_index.rebuild(conn, store.read_entries(memory_dir))
+    return conn
+
+
+def update_index(memory_dir: Path, added: list, removed: list):
+    """存储变化后同步倒排索引"""
+    conn = experience_index.connect(memory_dir)
+    try:
+        experience_index.remove_entries(conn, [e["id"] for e in removed])
+        experience_index.add_entries(conn, added)
+    finally:
+        conn.close()
+
+
+def new_entry(experience: str, task: str = None, category: str = "general", now: datetime = None) -> dict:
+    now = now or datetime.now()
+    return {
+        "id": store.new_experience_id(now),
         "content": experience,
         "task": task,
-        "category": category,
+        "category": category or "general",
         "created": now.isoformat(),
-        "used_count": 0
+        "used_count": 0,
+        "tokens": store.estimate_tokens(format_injection_line({"content": experience, "task": task}))
     }
-    experiences.append(new_exp)
-    
-    # 保留最近 MAX_EXPERIENCES 条
-    if len(experiences) > MAX_EXPERIENCES:
-        experiences = experiences[-MAX_EXPERIENCES:]
-    
-    exp_json.write_text(json.dumps(experiences, indent=2, ensure_ascii=False))
-    
-    # 同时更新 Markdown 文件（人类可读）
-    task_info = f" ({task})" if task else ""
-    new_line = f"- [{date_str}] {experience}{task_info}\n"
-    
-    if exp_file.exists():
-        content = exp_file.read_text()
-        # 在 "## 经验记录" 后插入
-        if "## 经验记录" in content:
-            parts = content.split("## 经验记录")
-            # 移除 "(暂无记录)" 提示
-            rest = parts[1].replace("*(暂无记录)*\n", "").replace("*(暂无记录)*", "")
-            content = parts[0] + "## 经验记录\n\n" + new_line + rest.lstrip('\n')
-            exp_file.write_text(content)
-    else:
-        # 创建新文件
-        content = f"""# 经验记忆 - {agent_id}
 
-*记录执行任务中获得的有效经验*
 
-## 经验记录
+def split_duplicates(memory_dir: Path, pending: list) -> tuple:
+    """
+    将待写入的经验分为新经验和近重复经验
 
-{new_line}
-"""
-        exp_file.write_text(content)
+    近重复 = 与已有经验（或同批中更早的经验）MinHash 估算的 Jaccard 相似度 ≥ 0.7。
+    返回 (新经验列表, {重复经验 ID: 已有经验 ID})。
+    """
+    unique = []
+    signatures = []
+    duplicates = {}
+    conn = open_index(memory_dir)
+    try:
+        for exp in pending:
+            signature = experience_index.minhash(exp["content"])
+            existing = experience_index.find_near_duplicate(conn, signature)
+            if existing is None and signature is not None:
+                existing = next((e["id"] for e, other in zip(unique, signatures)
+                                 if other is not None and experience_index.similarity(signature, other)
+                                 >= experience_index.NEAR_DUPLICATE_JACCARD), None)
+            if existing is None:
+                unique.append(exp)
+                signatures.append(signature)
+            else:
+                duplicates[exp["id"]] = existing
+    finally:
+        conn.close()
+    return unique, duplicates
+
+
+def append_experiences(agent_id: str, new_exps: list, base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """
+    追加一批经验（同一智能体）
+
+    返回 {"total": 保留总数, "flushed": 本次处理的条数, "duplicates": {新 ID: 已有 ID}}。
+
+    写入前先在 .pending/ 排队再抢锁。拿到锁的写入者把队列中所有并发写入者的经验
+    合并成一次写入（一次追加 jsonl、一次更新倒排索引、一次写入 Markdown），
+    并把每个排队文件的近重复判定写入结果文件；若自己的经验已被别人合并写入，
+    则从结果文件取回判定，flushed 为 0。
+    近重复的经验不再追加，而是给已有经验的 seen_count 加一。
+    """
+    memory_dir = get_memory_dir(agent_id, base_path)
+    ticket = store.spool_entries(memory_dir, new_exps)
+    
+    with store.locked(memory_dir):
+        if not ticket.exists():
+            result = store.take_spool_result(ticket)
+            return {"total": store.count_entries(memory_dir), "flushed": 0,
+                    "duplicates": result.get("duplicates", {}), "archived": 0}
+        
+        tickets, batches = store.take_spool(memory_dir)
+        pending = [exp for batch in batches for exp in batch]
+        unique, duplicates = split_duplicates(memory_dir, pending)
+        
+        # 追加到 experience.jsonl（结构化），重复的只记一次计数
+        previous = store.count_entries(memory_dir)
+        total = store.append_entries(memory_dir, unique) if unique else previous
+        if duplicates:
+            store.append_usage(memory_dir, list(duplicates.values()), datetime.now().isoformat(),
+                               field="seen_count")
+        results = {
+            other: {"duplicates": {exp["id"]: duplicates[exp["id"]] for exp in batch if exp["id"] in duplicates}}
+            for other, batch in zip(tickets, batches) if other != ticket
+        }
+        store.clear_spool(tickets, results)
+        
+        # 超过容量 × slack 时按保留策略整理一次，淘汰到容量以内，被淘汰的经验写入冷归档分段
+        dropped = []
+        config = retention.load_config(memory_dir, MAX_EXPERIENCES)
+        if total > retention.max_hot_entries(config):
+            # 先写入并落盘归档分段再重写热存储：中途崩溃最多重复归档，不会丢失经验
+            dropped = store.compact(memory_dir, lambda entries: retention.select_evictions(entries, config),
+                                    before_rewrite=lambda evicted: archive.archive_entries(memory_dir, evicted))
+            total -= len(dropped)
+        
+        # 增量更新倒排索引；向量文件（启用后）整理时重建，否则追加
+        update_index(memory_dir, unique, dropped)
+        if dropped and vectors.vectors_path(memory_dir).exists():
+            vectors.rebuild(memory_dir, store.read_entries(memory_dir))
+        else:
+            vectors.append(memory_dir, unique)
+        
+        # 同时写入 Markdown 文件（人类可读，从新到旧）
+        if unique:
+            append_markdown(agent_id, [format_markdown_line(e) for e in unique], base_path=base_path)
+    
+    return {"total": total, "flushed": len(pending), "duplicates": duplicates, "archived": len(dropped)}
+
+
+def log_experience(agent_id: str, experience: str, task: str = None, 
+                   category: str = "general", base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """记录一条经验"""
+    new_exp = new_entry(experience, task, category)
+    result = append_experiences(agent_id, [new_exp], base_path)
+    duplicate_of = result["duplicates"].get(new_exp["id"])
     
     return {
         "success": True,
         "agent_id": agent_id,
-        "experience_id": new_exp["id"],
-        "total_experiences": len(experiences)
+        "experience_id": duplicate_of or new_exp["id"],
+        "duplicate": duplicate_of is not None,
+        "total_experiences": result["total"]
     }
 
 
-def show_experiences(agent_id: str, limit: int = 10, base_path: str = DEFAULT_AGENTS_PATH) -> list:
-    """查看智能体的经验记录"""
-    exp_json = get_experience_json(agent_id, base_path)
+def log_batch(lines, base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """
+    批量记录经验（JSONL，每行一条）
+
+    每行格式: {"agent_id": "researcher", "experience": "...", "task": "...", "category": "..."}
+    （也接受 "agent" / "content" 作为字段名）
+    按智能体分组，每个智能体的存储只加锁写入一次。
+    """
+    by_agent = defaultdict(list)
+    errors = []
+    now = datetime.now()
     
-    if not exp_json.exists():
-        return []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            errors.append({"line": line_no, "error": f"JSON 解析失败: {e}"})
+            continue
+        
+        if not isinstance(item, dict):
+            errors.append({"line": line_no, "error": "每行必须是 JSON 对象"})
+            continue
+        
+        agent_id = item.get("agent_id") or item.get("agent")
+        experience = item.get("experience") or item.get("content")
+        if not agent_id or not experience:
+            errors.append({"line": line_no, "error": "缺少 agent_id 或 experience"})
+            continue
+        if not isinstance(agent_id, str) or not isinstance(experience, str) \
+                or not all(isinstance(item.get(k), (str, type(None))) for k in ("task", "category")):
+            errors.append({"line": line_no, "error": "agent_id / experience / task / category 必须是字符串"})
+            continue
+        
+        by_agent[agent_id].append(new_entry(experience, item.get("task"), item.get("category"), now))
     
-    try:
-        experiences = json.loads(exp_json.read_text())
-        return experiences[-limit:]  # 返回最近 N 条
-    except:
-        return []
+    agents = []
+    for agent_id, new_exps in by_agent.items():
+        result = append_experiences(agent_id, new_exps, base_path)
+        duplicates = result["duplicates"]
+        agents.append({
+            "agent_id": agent_id,
+            "experience_ids": [duplicates.get(e["id"], e["id"]) for e in new_exps],
+            "logged": len(new_exps) - len(duplicates),
+            "duplicates": len(duplicates),
+            "total_experiences": result["total"]
+        })
+    
+    return {
+        "success": not errors,
+        "logged": sum(a["logged"] for a in agents),
+        "agents": agents,
+        "errors": errors
+    }
+
+
+def show_experiences(agent_id: str, limit: int = 10, base_path: str = DEFAULT_AGENTS_PATH,
+                     include_archive: bool = False) -> list:
+    """查看智能体的经验记录；include_archive 时热存储不足 N 条会继续读冷归档"""
+    memory_dir = get_memory_dir(agent_id, base_path)
+    experiences = store.tail_entries(memory_dir, limit)  # 返回最近 N 条
+    if include_archive and len(experiences) < limit:
+        experiences = archive.recent_archived(memory_dir, limit - len(experiences)) + experiences
+    return experiences
 
 
 def generate_summary(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> str:
-    """生成经验摘要（按类别分组）"""
-    experiences = show_experiences(agent_id, limit=50, base_path=base_path)
-    
-    if not experiences:
+    """生成经验摘要（按类别分组，读取增量维护的类别汇总，不扫描历史）"""
+    memory_dir = get_memory_dir(agent_id, base_path)
+    if not store.count_entries(memory_dir) and not store.legacy_path(memory_dir).exists():
         return "暂无经验记录"
     
-    # 按类别分组
-    by_category = defaultdict(list)
-    for exp in experiences:
-        cat = exp.get("category", "general")
-        by_category[cat].append(exp["content"])
+    rollup = store.read_rollup(memory_dir)
+    if not rollup["categories"]:
+        return "暂无经验记录"
     
     # 生成摘要
     lines = [f"## {agent_id} 经验摘要\n"]
-    for cat, exps in by_category.items():
-        lines.append(f"### {cat}")
-        for exp in exps[-5:]:  # 每类最多 5 条
-            lines.append(f"- {exp}")
+    for cat, bucket in rollup["categories"].items():
+        lines.append(f"### {cat} ({bucket['count']})")
+        for exp in bucket["recent"]:  # 每类最近 5 条
+            lines.append(f"- {exp['content']}")
         lines.append("")
     
     return "\n".join(lines)
 
 
-def inject_experiences(agent_id: str, limit: int = 5, base_path: str = DEFAULT_AGENTS_PATH) -> str:
+def rank_experiences(agent_id: str, query: str, limit: int = 5, base_path: str = DEFAULT_AGENTS_PATH,
+                     include_archive: bool = False, mode: str = "bm25", recency_weight: float = 0.0,
+                     min_similarity: float = vectors.MIN_SIMILARITY) -> list:
     """
-    输出可注入到 prompt 的经验片段
-    用于在 spawn 时注入相关经验
+    按与任务描述的相关度返回最相关的 N 条经验
+
+    mode 为 "bm25"（关键词）或 "vector"（字符 n-gram 向量，可用 recency_weight 混入新近度，
+    余弦相似度不高于 min_similarity 的视为噪声）。
+    include_archive 时同时检索冷归档（仅 bm25，冷归档没有向量）。
     """
-    experiences = show_experiences(agent_id, limit=limit, base_path=base_path)
+    memory_dir = get_memory_dir(agent_id, base_path)
+    if mode == "vector":
+        return [dict(exp, score=round(score, 4))
+                for score, exp in vectors.search(memory_dir, query, limit, recency_weight, min_similarity)]
     
+    results = []
+    if store.count_entries(memory_dir) or store.legacy_path(memory_dir).exists():
+        conn = open_index(memory_dir)
+        try:
+            results = experience_index.search(conn, query, limit)
+        finally:
+            conn.close()
+    
+    if include_archive:
+        cold = [(score, dict(exp, archived=True)) for score, exp in archive.search_archive(memory_dir, query, limit)]
+        results = sorted(results + cold, key=lambda item: item[0], reverse=True)[:limit]
+    
+    return [dict(exp, score=round(score, 4)) for score, exp in results]
+
+
+def format_injection_line(exp: dict) -> str:
+    return store.injection_line(exp)
+
+
+def entry_tokens(exp: dict) -> int:
+    """记录时缓存的 token 数（旧条目缺失时才现场估算）"""
+    tokens = exp.get("tokens")
+    if tokens is None:
+        tokens = store.estimate_tokens(format_injection_line(exp))
+    return tokens
+
+
+def select_experiences(agent_id: str, limit: int = 5, base_path: str = DEFAULT_AGENTS_PATH,
+                       query: str = None, max_tokens: int = None, include_archive: bool = False,
+                       mode: str = "bm25", recency_weight: float = 0.0,
+                       min_similarity: float = vectors.MIN_SIMILARITY) -> dict:
+    """
+    选取要注入的经验
+
+    提供 query 时按相关度排序（mode / recency_weight / min_similarity 见 rank_experiences），否则按时间从新到旧；
+    设置 max_tokens 时按该顺序贪心装入预算，放不下的条目跳过并计入 dropped。
+    """
+    if query:
+        candidates = rank_experiences(agent_id, query, limit=limit, base_path=base_path,
+                                      include_archive=include_archive, mode=mode,
+                                      recency_weight=recency_weight, min_similarity=min_similarity)
+    else:
+        candidates = show_experiences(agent_id, limit=limit, base_path=base_path,
+                                      include_archive=include_archive)[::-1]
+    
+    selected = []
+    used = 0
+    if max_tokens is None:
+        selected = candidates
+        used = sum(entry_tokens(exp) for exp in candidates)
+    elif candidates:
+        used = store.estimate_tokens(INJECT_HEADER)
+        for exp in candidates:
+            cost = entry_tokens(exp)
+            if used + cost <= max_tokens:
+                selected.append(exp)
+                used += cost
+        if not selected:
+            used = 0
+    
+    if not query:
+        selected = selected[::-1]  # 按时间顺序输出
+    
+    return {
+        "experiences": selected,
+        "tokens": used,
+        "dropped": len(candidates) - len(selected),
+    }
+
+
+def format_injection(experiences: list) -> str:
     if not experiences:
         return ""
     
-    lines = ["## 历史经验（供参考）\n"]
+    lines = [INJECT_HEADER]
     for exp in experiences:
-        task_info = f" (来自: {exp['task']})" if exp.get('task') else ""
-        lines.append(f"- {exp['content']}{task_info}")
+        lines.append(format_injection_line(exp))
     
     return "\n".join(lines)
 
 
+def inject_experiences(agent_id: str, limit: int = 5, base_path: str = DEFAULT_AGENTS_PATH,
+                       query: str = None, max_tokens: int = None, include_archive: bool = False,
+                       mode: str = "bm25", recency_weight: float = 0.0,
+                       min_similarity: float = vectors.MIN_SIMILARITY) -> str:
+    """
+    输出可注入到 prompt 的经验片段
+    用于在 spawn 时注入相关经验；提供 query 时按相关度选取，否则取最近 N 条
+    """
+    selection = select_experiences(agent_id, limit=limit, base_path=base_path,
+                                   query=query, max_tokens=max_tokens, include_archive=include_archive,
+                                   mode=mode, recency_weight=recency_weight, min_similarity=min_similarity)
+    return format_injection(selection["experiences"])
+
+
+def mark_experiences_used(agent_id: str, exp_ids: list, base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """
+    批量标记经验已被使用（用于统计有效性）
+
+    只向使用日志追加一次，不重写经验存储；读取时合并计数，
+    日志超过 USAGE_FOLD_BYTES 时折叠进 jsonl。
+    存储中没有的 ID 不记录，列在 not_found 中；全部不存在时 success 为 False。
+    """
+    memory_dir = get_memory_dir(agent_id, base_path)
+    if not exp_ids or not store.log_path(memory_dir).exists():
+        return {"success": False, "agent_id": agent_id, "marked": 0, "not_found": list(exp_ids)}
+    
+    conn = open_index(memory_dir)
+    try:
+        known = experience_index.known_ids(conn, exp_ids)
+    finally:
+        conn.close()
+    found = [exp_id for exp_id in exp_ids if exp_id in known]
+    not_found = [exp_id for exp_id in exp_ids if exp_id not in known]
+    if not found:
+        return {"success": False, "agent_id": agent_id, "marked": 0, "not_found": not_found}
+    
+    size = store.append_usage(memory_dir, found, datetime.now().isoformat())
+    folded = store.fold_usage(memory_dir) if size > store.USAGE_FOLD_BYTES else 0
+    
+    return {
+        "success": True,
+        "agent_id": agent_id,
+        "marked": len(found),
+        "not_found": not_found,
+        "folded": folded
+    }
+
+
 def mark_experience_used(agent_id: str, exp_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> bool:
     """标记经验已被使用（用于统计有效性）"""
-    exp_json = get_experience_json(agent_id, base_path)
+    return mark_experiences_used(agent_id, [exp_id], base_path)["success"]
+
+
+def set_retention(agent_id: str, policy: str = None, capacity: int = None,
+                  half_life_days: float = None, slack: float = None,
+                  base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """
+    查看或修改智能体的经验保留策略（未提供的参数保持不变）
+
+    capacity 为整理后保留的条数（至少为 1）；热存储超过 capacity × slack 条
+    （输出中的 max_hot_entries）时才整理一次，slack 至少为 1。
+    """
+    if capacity is not None and not retention.valid_capacity(capacity):
+        raise ValueError(f"保留容量必须是正整数: {capacity}")
+    if slack is not None and not retention.valid_slack(slack):
+        raise ValueError(f"slack 必须是不小于 1 的有限数: {slack}")
+    memory_dir = get_memory_dir(agent_id, base_path)
+    config = retention.load_config(memory_dir, MAX_EXPERIENCES)
     
-    if not exp_json.exists():
-        return False
+    changes = {"policy": policy, "capacity": capacity, "half_life_days": half_life_days, "slack": slack}
+    changes = {k: v for k, v in changes.items() if v is not None}
+    if changes:
+        config.update(changes)
+        retention.save_config(memory_dir, config)
     
-    try:
-        experiences = json.loads(exp_json.read_text())
-        for exp in experiences:
-            if exp.get("id") == exp_id:
-                exp["used_count"] = exp.get("used_count", 0) + 1
-                exp["last_used"] = datetime.now().isoformat()
-        exp_json.write_text(json.dumps(experiences, indent=2, ensure_ascii=False))
-        return True
-    except:
-        return False
+    return {
+        "success": True,
+        "agent_id": agent_id,
+        "retention": config,
+        "max_hot_entries": retention.max_hot_entries(config),
+        "total_experiences": store.count_entries(memory_dir)
+    }
+
+
+def migrate(agent_id: str, base_path: str = DEFAULT_AGENTS_PATH) -> dict:
+    """将旧版 experience.json 迁移到 experience.jsonl"""
+    memory_dir = get_memory_dir(agent_id, base_path)
+    migrated = store.migrate_legacy(memory_dir)
+    return {
+        "success": True,
+        "agent_id": agent_id,
+        "migrated": migrated,
+        "total_experiences": store.count_entries(memory_dir)
+    }
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"必须是正整数: {value}")
+    return number
+
+
+def _slack(value: str) -> float:
+    number = float(value)
+    if not retention.valid_slack(number):
+        raise argparse.ArgumentTypeError(f"必须是不小于 1 的有限数: {value}")
+    return number
 
 
 def main():
     parser = argparse.ArgumentParser(description="智能体经验记录工具")
-    parser.add_argument("action", choices=["log", "show", "summary", "inject"])
-    parser.add_argument("agent_id", help="智能体 ID")
-    parser.add_argument("experience", nargs="?", help="经验描述（log 时必填）")
+    parser.add_argument("action", choices=["log", "log-batch", "show", "summary", "inject", "mark-used", "retention", "archive", "search", "migrate"])
+    parser.add_argument("agent_id", nargs="?", help="智能体 ID（search 时为查询内容）")
+    parser.add_argument("experience", nargs="?", help="经验描述（log 时必填）；mark-used 时为经验 ID")
+    parser.add_argument("more_ids", nargs="*", help="更多经验 ID（mark-used 时使用）")
     parser.add_argument("--task", help="来源任务")
     parser.add_argument("--category", default="general", help="经验类别")
     parser.add_argument("--limit", type=int, default=10, help="显示数量")
+    parser.add_argument("--query", help="任务描述（inject 时按相关度排序）")
+    parser.add_argument("--mode", choices=["bm25", "vector"], default="bm25",
+                        help="相关度算法（inject --query 时使用）：关键词 BM25 或离线 n-gram 向量")
+    parser.add_argument("--recency-weight", type=float, default=0.0,
+                        help="vector 模式下新近度的权重（0-1）")
+    parser.add_argument("--min-similarity", type=float, default=vectors.MIN_SIMILARITY,
+                        help="vector 模式下的最低余弦相似度，不高于该值的经验视为噪声")
+    parser.add_argument("--max-tokens", type=int, help="注入的 token 预算（inject 时使用）")
+    parser.add_argument("--archive", action="store_true", help="同时检索冷归档（show/inject 时使用）")
+    parser.add_argument("--agents", help="逗号分隔的智能体 ID（search 时使用，默认全部）")
+    parser.add_argument("--policy", choices=retention.POLICIES, help="保留策略（retention 时使用）")
+    parser.add_argument("--capacity", type=_positive_int,
+                        help="保留容量，至少为 1（retention 时使用；热存储超过 容量 × slack 时整理到该条数）")
+    parser.add_argument("--slack", type=_slack,
+                        help=f"整理前热存储可超出容量的倍数，至少为 1（retention 时使用，默认 {retention.DEFAULT_SLACK}）")
+    parser.add_argument("--half-life", type=float, help="decayed 策略的半衰期（天）")
+    parser.add_argument("--file", help="JSONL 文件（log-batch 时使用，默认读 stdin）")
     parser.add_argument("--base-path", default=DEFAULT_AGENTS_PATH)
     
     args = parser.parse_args()
     
+    if args.action == "log-batch":
+        if args.file and args.file != "-":
+            with open(args.file, encoding="utf-8") as f:
+                result = log_batch(f, base_path=args.base_path)
+        else:
+            result = log_batch(sys.stdin, base_path=args.base_path)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    
+    if not args.agent_id:
+        print(f"错误: {args.action} 操作需要指定 agent_id")
+        return
+    
+    if args.action == "search":
+        agents = [a.strip() for a in args.agents.split(",") if a.strip()] if args.agents else None
+        result = experience_global.search(args.base_path, args.agent_id, agents=agents, limit=args.limit)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    
     if args.action == "log":
         if not args.experience:
             print("错误: log 操作需要提供经验描述")
@@ -202,7 +585,8 @@ def main():
         print(json.dumps(result, indent=2, ensure_ascii=False))
     
     elif args.action == "show":
-        experiences = show_experiences(args.agent_id, limit=args.limit, base_path=args.base_path)
+        experiences = show_experiences(args.agent_id, limit=args.limit, base_path=args.base_path,
+                                       include_archive=args.archive)
         for exp in experiences:
             print(f"[{exp.get('created', '?')[:10]}] {exp['content']}")
     
@@ -210,7 +594,40 @@ def main():
         print(generate_summary(args.agent_id, args.base_path))
     
     elif args.action == "inject":
-        print(inject_experiences(args.agent_id, limit=args.limit, base_path=args.base_path))
+        selection = select_experiences(args.agent_id, limit=args.limit, base_path=args.base_path,
+                                       query=args.query, max_tokens=args.max_tokens,
+                                       include_archive=args.archive, mode=args.mode,
+                                       recency_weight=args.recency_weight,
+                                       min_similarity=args.min_similarity)
+        print(format_injection(selection["experiences"]))
+        if args.max_tokens is not None:
+            # 统计信息输出到 stderr，stdout 保持可直接注入
+            print(json.dumps({
+                "injected": len(selection["experiences"]),
+                "dropped": selection["dropped"],
+                "tokens": selection["tokens"],
+                "max_tokens": args.max_tokens,
+            }, ensure_ascii=False), file=sys.stderr)
+    
+    elif args.action == "mark-used":
+        exp_ids = [args.experience] + args.more_ids if args.experience else []
+        if not exp_ids:
+            print("错误: mark-used 操作需要提供经验 ID")
+            return
+        print(json.dumps(mark_experiences_used(args.agent_id, exp_ids, args.base_path),
+                         indent=2, ensure_ascii=False))
+    
+    elif args.action == "retention":
+        result = set_retention(args.agent_id, policy=args.policy, capacity=args.capacity,
+                               half_life_days=args.half_life, slack=args.slack, base_path=args.base_path)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    
+    elif args.action == "archive":
+        result = archive.archive_stats(get_memory_dir(args.agent_id, args.base_path))
+        print(json.dumps(dict(result, agent_id=args.agent_id), indent=2, ensure_ascii=False))
+    
+    elif args.action == "migrate":
+        print(json.dumps(migrate(args.agent_id, args.base_path), indent=2, ensure_ascii=False))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+经验保留策略
+
+每个智能体可在 memory/retention.json 中配置自己的策略和容量：
+
+    {"policy": "decayed", "capacity": 500, "half_life_days": 30, "slack": 1.2}
+
+策略（得分越低越先被淘汰）:
+    recency  按创建时间，保留最新的（默认，与原先的截断行为一致）
+    lfu      按使用次数，次数相同时保留较新的
+    decayed  使用次数按半衰期衰减: (次数 + 1) * 2^(-age / half_life)，
+             age 以最近一次使用（或创建）时间为准
+
+使用次数 = used_count（被注入使用）+ seen_count（被重复记录，见近重复检测）。
+
+容量是整理后保留的条数。jsonl 只能追加，淘汰需要整体重写，所以写入时热存储超过
+容量 × slack（max_hot_entries）才整理一次，淘汰到容量以内：两次整理之间热存储
+最多为 max_hot_entries 条，注入、摘要等读取的也是这些条目。slack 默认 DEFAULT_SLACK，
+为 1 时每次超出容量都立即整理（每条写入都重写存储）；越大重写越少、热存储越大。
+淘汰用最小堆完成：每次整理建堆 O(n)，每淘汰一条 O(log n)，重写 O(n)。
+"""
+
+import json
+import math
+import heapq
+from pathlib import Path
+from datetime import datetime
+
+CONFIG_NAME = "retention.json"
+
+POLICIES = ("recency", "lfu", "decayed")
+DEFAULT_POLICY = "recency"
+DEFAULT_HALF_LIFE_DAYS = 30
+DEFAULT_SLACK = 1.2
+
+
+def config_path(memory_dir: Path) -> Path:
+    return memory_dir / CONFIG_NAME
+
+
+def valid_capacity(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+def valid_slack(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 1 <= value < math.inf
+
+
+def max_hot_entries(config: dict) -> int:
+    """热存储在整理前最多保留的条数（超过时整理到 capacity）"""
+    return max(int(config["capacity"] * config["slack"]), config["capacity"])
+
+
+def load_config(memory_dir: Path, default_capacity: int) -> dict:
+    """读取智能体的保留策略，缺省或无效的项使用默认值"""
+    config = {
+        "policy": DEFAULT_POLICY,
+        "capacity": default_capacity,
+        "half_life_days": DEFAULT_HALF_LIFE_DAYS,
+        "slack": DEFAULT_SLACK,
+    }
+    try:
+        config.update(json.loads(config_path(memory_dir).read_text(encoding="utf-8")))
+    except (FileNotFoundError, ValueError):
+        pass
+    if config["policy"] not in POLICIES:
+        config["policy"] = DEFAULT_POLICY
+    if not valid_capacity(config["capacity"]):
+        config["capacity"] = default_capacity
+    if not valid_slack(config["slack"]):
+        config["slack"] = DEFAULT_SLACK
+    return config
+
+
+def save_config(memory_dir: Path, config: dict):
+    memory_dir.mkdir(parents=True, exist_ok=True)
+    config_path(memory_dir).write_text(json.dumps(config, indent=2, ensure_ascii=False))
+
+
+def _timestamp(value: str) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def retention_key(entry: dict, policy: str, half_life_days: float = DEFAULT_HALF_LIFE_DAYS) -> tuple:
+    """
+    条目的保留得分（元组，越小越先淘汰）
+
+    decayed 取对数后为 log2(used + 1) + t / half_life，与当前时间无关，
+    因此堆中的键不会随时间失效。
+    """
+    created = _timestamp(entry.get("created"))
+    hits = entry.get("used_count", 0) + entry.get("seen_count", 0)
+    if policy == "lfu":
+        return (hits, created)
+    if policy == "decayed":
+        reference = max(created, _timestamp(entry.get("last_used")), _timestamp(entry.get("last_seen")))
+        half_life = max(half_life_days, 1e-6) * 86400
+        return (math.log2(hits + 1) + reference / half_life, created)
+    return (created,)
+
+
+class RetentionHeap:
+    """按保留得分组织的最小堆，堆顶为下一个被淘汰的条目"""
+
+    def __init__(self, entries: list, policy: str = DEFAULT_POLICY,
+                 half_life_days: float = DEFAULT_HALF_LIFE_DAYS):
+        self.policy = policy
+        self.half_life_days = half_life_days
+        # 序号保证同分时按写入顺序稳定，并避免比较 dict
+        self._heap = [(self.key(e), i, e) for i, e in enumerate(entries)]
+        self._seq = len(self._heap)
+        heapq.heapify(self._heap)
+
+    def key(self, entry: dict) -> tuple:
+        return retention_key(entry, self.policy, self.half_life_days)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, entry: dict):
+        heapq.heappush(self._heap, (self.key(entry), self._seq, entry))
+        self._seq += 1
+
+    def pop(self) -> dict:
+        return heapq.heappop(self._heap)[2]
+
+    def evict_to(self, capacity: int) -> list:
+        """淘汰直到不超过 capacity，返回被淘汰的条目"""
+        evicted = []
+        while len(self._heap) > capacity:
+            evicted.append(self.pop())
+        return evicted
+
+
+def select_evictions(entries: list, config: dict) -> list:
+    """按策略选出需要淘汰的条目，使剩余条数不超过容量"""
+    capacity = config["capacity"]
+    if len(entries) <= capacity:
+        return []
+    heap = RetentionHeap(entries, config["policy"], config["half_life_days"])
+    return heap.evict_to(capacity)
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+经验存储层（追加写 JSONL）
+
+每个智能体的经验保存在 memory/ 目录下：
+
+    experience.jsonl   每行一条经验（只追加）
+    experience.idx     偏移索引，每条经验 8 字节（小端 uint64），记录该行在 jsonl 中的起始位置
+    experience.usage   计数日志，每次使用/重复出现追加一行 "<id>\t<时间>\t<字段>"，读取时合并，定期折叠进 jsonl
+    experience.rollup.json  按类别的汇总（条数 + 最近几条），随写入增量维护
+    experience.lock    建议锁（fcntl），所有写操作都在锁内进行
+    .pending/          待写入的经验（并发写入时由持锁者合并成一次写入）
+
+记录一条经验只需追加一行 + 8 字节索引，与历史条数无关；
+读取最近 N 条时借助偏移索引从文件末尾直接定位，内存只与 N 相关。
+整体重写一律写临时文件后原子替换，不会留下半截文件。
+旧版 experience.json 会在首次访问时自动迁移。
+"""
+
+import os
+import re
+import json
+import math
+import fcntl
+import struct
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
+
+LOG_NAME = "experience.jsonl"
+INDEX_NAME = "experience.idx"
+LEGACY_NAME = "experience.json"
+LOCK_NAME = "experience.lock"
+USAGE_NAME = "experience.usage"
+USAGE_FOLD_BYTES = 64 * 1024  # 使用日志超过此大小时折叠进主存储
+ROLLUP_NAME = "experience.rollup.json"
+ROLLUP_RECENT = 5  # 汇总中每个类别保留的最近条数
+SPOOL_DIR = ".pending"
+MIGRATED_SUFFIX = ".migrated"
+
+OFFSET = struct.Struct("<Q")
+
+_last_id_ns = 0
+_id_lock = threading.Lock()
+_thread_state = threading.local()  # 每个线程持有的锁：{路径: 嵌套深度}
+_path_locks = {}  # 路径 → threading.Lock，同一进程内的线程互斥
+_path_locks_guard = threading.Lock()
+
+# 估算 token 数：CJK 等宽字符约 1 token/字，其余 ASCII 文本约 4 字符/token
+_WIDE_RE = re.compile(r"[^\x00-\x7f]")
+
+
+def log_path(memory_dir: Path) -> Path:
+    return memory_dir / LOG_NAME
+
+
+def index_path(memory_dir: Path) -> Path:
+    return memory_dir / INDEX_NAME
+
+
+def usage_path(memory_dir: Path) -> Path:
+    return memory_dir / USAGE_NAME
+
+
+def rollup_path(memory_dir: Path) -> Path:
+    return memory_dir / ROLLUP_NAME
+
+
+def legacy_path(memory_dir: Path) -> Path:
+    return memory_dir / LEGACY_NAME
+
+
+@contextmanager
+def locked(memory_dir: Path, shared: bool = False):
+    """
+    对单个智能体的经验存储加锁（fcntl 建议锁，进程退出自动释放）
+
+    写操作用排他锁，读操作用共享锁。同一线程内可重入（嵌套调用沿用外层的锁）；
+    同一进程的不同线程之间另用 threading.Lock 互斥。
+    """
+    key = str(memory_dir.resolve())
+    held = getattr(_thread_state, "held", None)
+    if held is None:
+        held = _thread_state.held = {}
+    if held.get(key):
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    with _path_locks_guard:
+        thread_lock = _path_locks.setdefault(key, threading.Lock())
+    with thread_lock:
+        memory_dir.mkdir(parents=True, exist_ok=True)
+        with open(memory_dir / LOCK_NAME, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            held[key] = 1
+            try:
+                yield
+            finally:
+                del held[key]
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def new_experience_id(now: datetime = None) -> str:
+    """
+    生成单调递增、不冲突的经验 ID
+
+    格式: exp_<YYYYmmddHHMMSS>_<纳秒部分 9 位>_<pid>
+    同一进程内（含多线程）严格递增；不同进程由 pid 区分。
+    """
+    global _last_id_ns
+    with _id_lock:
+        ns = time.time_ns()
+        if ns <= _last_id_ns:
+            ns = _last_id_ns + 1
+        _last_id_ns = ns
+    stamp = datetime.fromtimestamp(ns // 1_000_000_000).strftime("%Y%m%d%H%M%S")
+    return f"exp_{stamp}_{ns % 1_000_000_000:09d}_{os.getpid():x}"
+
+
+def estimate_tokens(text: str) -> int:
+    """离线估算文本的 token 数（偏保守）"""
+    if not text:
+        return 0
+    wide = len(_WIDE_RE.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def injection_line(entry: dict) -> str:
+    """经验注入 prompt 时的一行；条目的 tokens 字段按这一行估算"""
+    task_info = f" (来自: {entry['task']})" if entry.get("task") else ""
+    return f"- {entry.get('content') or ''}{task_info}"
+
+
+def count_entries(memory_dir: Path) -> int:
+    """条目数（只 stat 索引文件）"""
+    try:
+        return index_path(memory_dir).stat().st_size // OFFSET.size
+    except FileNotFoundError:
+        return 0
+
+
+def _encode(entry: dict) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def write_bytes_atomic(path: Path, data: bytes):
+    """写临时文件并 fsync 后原子替换"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def fsync_dir(path: Path):
+    """fsync 目录，使其中新建 / 替换的文件名落盘"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_text_atomic(path: Path, text: str):
+    write_bytes_atomic(path, text.encode("utf-8"))
+
+
+def rebuild_offsets(memory_dir: Path) -> int:
+    """扫描 jsonl 重建偏移索引（只收录可解析的行），返回条目数"""
+    offsets = []
+    path = log_path(memory_dir)
+    if path.exists():
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    json.loads(line)
+                    offsets.append(OFFSET.pack(offset))
+                except ValueError:
+                    pass
+                offset += len(line)
+    write_bytes_atomic(index_path(memory_dir), b"".join(offsets))
+    return len(offsets)
+
+
+def _check_tail(memory_dir: Path, log) -> int:
+    """
+    检查 jsonl 末尾与偏移索引是否一致（须持锁），返回当前文件大小
+
+    进程在写入中途退出时可能留下不完整的最后一行或缺失的索引项：
+    补齐换行，必要时重建索引。正常情况下只读最后一行。
+    """
+    size = log.seek(0, os.SEEK_END)
+    if not size:
+        if count_entries(memory_dir):
+            rebuild_offsets(memory_dir)
+        return 0
+
+    log.seek(size - 1)
+    if log.read(1) != b"\n":
+        log.write(b"\n")
+        size += 1
+
+    count = count_entries(memory_dir)
+    consistent = False
+    if count:
+        with open(index_path(memory_dir), "rb") as idx:
+            idx.seek((count - 1) * OFFSET.size)
+            (last,) = OFFSET.unpack(idx.read(OFFSET.size))
+        log.seek(last)
+        log.readline()
+        consistent = log.tell() == size
+    if not consistent:
+        rebuild_offsets(memory_dir)
+    return size
+
+
+def append_entries(memory_dir: Path, entries: list) -> int:
+    """追加若干条经验，返回追加后的条目总数"""
+    with locked(memory_dir):
+        migrate_legacy(memory_dir)
+
+        with open(log_path(memory_dir), "a+b") as log:
+            offset = _check_tail(memory_dir, log)
+            offsets = []
+            chunks = []
+            for entry in entries:
+                data = _encode(entry)
+                offsets.append(OFFSET.pack(offset))
+                chunks.append(data)
+                offset += len(data)
+            log.write(b"".join(chunks))
+            log.flush()
+        with open(index_path(memory_dir), "ab") as idx:
+            idx.write(b"".join(offsets))
+
+        total = count_entries(memory_dir)
+        update_rollup(memory_dir, entries, total)
+
+    return total
+
+
+def read_entries(memory_dir: Path) -> list:
+    """按写入顺序读取全部经验（跳过损坏的行），并合并尚未折叠的使用计数"""
+    migrate_legacy(memory_dir)
+
+    path = log_path(memory_dir)
+    if not path.exists():
+        return []
+
+    entries = []
+    with locked(memory_dir, shared=True):
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        usage = read_usage(memory_dir)
+    return apply_usage(entries, usage)
+
+
+# 计数日志中的字段 -> 对应的时间字段
+COUNTERS = {"used_count": "last_used", "seen_count": "last_seen"}
+
+
+def tail_entries(memory_dir: Path, limit: int) -> list:
+    """
+    读取最近 limit 条经验（按写入顺序）
+
+    从偏移索引末尾取第 N 条的起始位置，只读取 jsonl 的最后这一段，
+    耗时和内存与总条数无关。
+    """
+    if limit <= 0:
+        return []
+    return read_from(memory_dir, -limit)
+
+
+def read_from(memory_dir: Path, start: int) -> list:
+    """读取第 start 条（从 0 开始，负数表示倒数）及之后的全部经验"""
+    migrate_legacy(memory_dir)
+    if not log_path(memory_dir).exists():
+        return []
+
+    with locked(memory_dir, shared=True):
+        count = count_entries(memory_dir)
+        if start < 0:
+            start = max(count + start, 0)
+        if start >= count:
+            return []
+        with open(index_path(memory_dir), "rb") as idx:
+            idx.seek(start * OFFSET.size)
+            (offset,) = OFFSET.unpack(idx.read(OFFSET.size))
+
+        entries = []
+        with open(log_path(memory_dir), "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        usage = read_usage(memory_dir)
+    return apply_usage(entries[:count - start], usage)
+
+
+def read_rows(memory_dir: Path, rows: list) -> dict:
+    """
+    按位置（从 0 开始）读取指定的若干条经验，返回 {位置: 经验}，顺序与 rows 一致
+
+    越界或无法解析的位置不在结果中，调用方应按位置取用而不是按顺序对应。
+    """
+    if not rows or not log_path(memory_dir).exists():
+        return {}
+
+    with locked(memory_dir, shared=True):
+        count = count_entries(memory_dir)
+        entries = {}
+        with open(index_path(memory_dir), "rb") as idx, open(log_path(memory_dir), "rb") as f:
+            for row in rows:
+                if not 0 <= row < count:
+                    continue
+                idx.seek(row * OFFSET.size)
+                (offset,) = OFFSET.unpack(idx.read(OFFSET.size))
+                f.seek(offset)
+                try:
+                    entries[row] = json.loads(f.readline())
+                except ValueError:
+                    continue
+        usage = read_usage(memory_dir)
+    apply_usage(list(entries.values()), usage)
+    return entries
+
+
+def _rollup_add(rollup: dict, entry: dict):
+    category = entry.get("category") or "general"
+    bucket = rollup["categories"].setdefault(category, {"count": 0, "recent": []})
+    bucket["count"] += 1
+    bucket["recent"] = (bucket["recent"] + [{"id": entry.get("id"), "content": entry.get("content")}])[-ROLLUP_RECENT:]
+
+
+def read_rollup(memory_dir: Path) -> dict:
+    """
+    读取按类别的汇总；汇总缺失或与条数不一致时（如刚迁移）从存储重建
+    """
+    total = count_entries(memory_dir)
+    try:
+        rollup = json.loads(rollup_path(memory_dir).read_text(encoding="utf-8"))
+        if rollup.get("total") == total:
+            return rollup
+    except (FileNotFoundError, ValueError):
+        pass
+
+    with locked(memory_dir):
+        return rebuild_rollup(memory_dir, read_entries(memory_dir))
+
+
+def update_rollup(memory_dir: Path, added: list, total: int):
+    """追加经验后增量更新汇总（须持锁）"""
+    try:
+        rollup = json.loads(rollup_path(memory_dir).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        rollup = None
+    if rollup is None or rollup.get("total") != total - len(added):
+        rebuild_rollup(memory_dir, read_entries(memory_dir))
+        return
+    for entry in added:
+        _rollup_add(rollup, entry)
+    rollup["total"] = total
+    write_text_atomic(rollup_path(memory_dir), json.dumps(rollup, ensure_ascii=False))
+
+
+def rebuild_rollup(memory_dir: Path, entries: list) -> dict:
+    rollup = {"total": len(entries), "categories": {}}
+    for entry in entries:
+        _rollup_add(rollup, entry)
+    write_text_atomic(rollup_path(memory_dir), json.dumps(rollup, ensure_ascii=False))
+    return rollup
+
+
+def append_usage(memory_dir: Path, ids: list, when: str, field: str = "used_count") -> int:
+    """为若干条经验的计数字段各加一（一次追加），返回计数日志当前大小（字节）"""
+    data = "".join(f"{exp_id}\t{when}\t{field}\n" for exp_id in ids).encode("utf-8")
+    with locked(memory_dir), open(usage_path(memory_dir), "ab") as f:
+        f.write(data)
+        return f.tell()
+
+
+def read_usage(memory_dir: Path) -> dict:
+    """汇总计数日志: {id: {字段: (次数, 最近时间)}}"""
+    usage = {}
+    try:
+        with open(usage_path(memory_dir), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    continue  # 不完整的行
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) < 2 or not parts[1]:
+                    continue
+                field = parts[2] if len(parts) > 2 else "used_count"
+                counters = usage.setdefault(parts[0], {})
+                count, _ = counters.get(field, (0, None))
+                counters[field] = (count + 1, parts[1])
+    except FileNotFoundError:
+        pass
+    return usage
+
+
+def apply_usage(entries: list, usage: dict) -> list:
+    if not usage:
+        return entries
+    for entry in entries:
+        for field, (count, when) in usage.get(entry.get("id"), {}).items():
+            entry[field] = entry.get(field, 0) + count
+            time_field = COUNTERS.get(field)
+            if time_field:
+                entry[time_field] = max(entry.get(time_field) or "", when)
+    return entries
+
+
+def fold_usage(memory_dir: Path) -> int:
+    """将使用日志折叠进 jsonl 并清空日志，返回折叠的记录数"""
+    with locked(memory_dir):
+        usage = read_usage(memory_dir)
+        if not usage:
+            return 0
+        rewrite_entries(memory_dir, read_entries(memory_dir))
+        _clear_usage(memory_dir)
+    return sum(count for counters in usage.values() for count, _ in counters.values())
+
+
+def _clear_usage(memory_dir: Path):
+    try:
+        usage_path(memory_dir).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def rewrite_entries(memory_dir: Path, entries: list):
+    """用给定条目整体重写存储（写临时文件后原子替换），并重建偏移索引"""
+    memory_dir.mkdir(parents=True, exist_ok=True)
+    chunks = []
+    offsets = []
+    offset = 0
+    for entry in entries:
+        data = _encode(entry)
+        offsets.append(OFFSET.pack(offset))
+        chunks.append(data)
+        offset += len(data)
+
+    with locked(memory_dir):
+        write_bytes_atomic(log_path(memory_dir), b"".join(chunks))
+        write_bytes_atomic(index_path(memory_dir), b"".join(offsets))
+        rebuild_rollup(memory_dir, entries)
+
+
+def spool_entries(memory_dir: Path, entries: list) -> Path:
+    """
+    将待写入的经验放入 .pending/（原子创建），返回该文件路径
+
+    写入者先排队再抢锁；拿到锁的一方把队列里所有经验合并成一次写入，
+    并为其他写入者留下结果文件（见 clear_spool）；其余写入者拿到锁后发现
+    自己的文件已被消费，读取结果文件即可返回。
+    """
+    spool = memory_dir / SPOOL_DIR
+    spool.mkdir(parents=True, exist_ok=True)
+    ticket = spool / f"{entries[0]['id']}.json"
+    write_bytes_atomic(ticket, json.dumps(entries, ensure_ascii=False).encode("utf-8"))
+    return ticket
+
+
+def take_spool(memory_dir: Path) -> tuple:
+    """读取排队中的全部经验（须持锁），返回 (文件列表, 每个文件中的经验列表)，按 ID 顺序"""
+    spool = memory_dir / SPOOL_DIR
+    if not spool.exists():
+        return [], []
+
+    tickets = sorted(p for p in spool.iterdir() if p.suffix == ".json" and not p.name.startswith("."))
+    batches = []
+    for ticket in tickets:
+        try:
+            batch = json.loads(ticket.read_text(encoding="utf-8"))
+        except ValueError:
+            batch = []
+        batches.append(batch if isinstance(batch, list) else [])
+    return tickets, batches
+
+
+def _result_path(ticket: Path) -> Path:
+    return ticket.with_suffix(".result")
+
+
+def clear_spool(tickets: list, results: dict = None):
+    """
+    删除已合并的排队文件（须持锁）
+
+    results 为 {排队文件: 结果}，先原子写入 <排队文件>.result 再删除排队文件，
+    由排队的写入者用 take_spool_result 取走。
+    """
+    for ticket in tickets:
+        if results and ticket in results:
+            write_bytes_atomic(_result_path(ticket),
+                               json.dumps(results[ticket], ensure_ascii=False).encode("utf-8"))
+        try:
+            ticket.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def take_spool_result(ticket: Path) -> dict:
+    """读取并删除排队文件的合并结果（须持锁），没有时返回 {}"""
+    path = _result_path(ticket)
+    try:
+        result = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+    path.unlink()
+    return result if isinstance(result, dict) else {}
+
+
+def compact(memory_dir: Path, select_evictions, before_rewrite=None) -> list:
+    """
+    整理存储：select_evictions(entries) 返回要移除的条目，其余按原顺序重写
+
+    before_rewrite(dropped) 在重写之前调用（如写入冷归档），它抛出异常时存储不变；
+    重写前崩溃最多导致下次整理重复归档，不会丢失条目。返回被移除的条目。
+    """
+    with locked(memory_dir):
+        entries = read_entries(memory_dir)
+        dropped = select_evictions(entries)
+        if dropped and before_rewrite is not None:
+            before_rewrite(dropped)
+        dropped_ids = {id(e) for e in dropped}
+        rewrite_entries(memory_dir, [e for e in entries if id(e) not in dropped_ids])
+        _clear_usage(memory_dir)  # 使用计数已随 read_entries 合并写入
+    return dropped
+
+
+def migrate_legacy(memory_dir: Path) -> int:
+    """
+    将旧版 experience.json 迁移到 experience.jsonl
+
+    仅在 jsonl 尚不存在时执行，迁移后旧文件重命名为 experience.json.migrated。
+    返回迁移的条目数。
+    """
+    legacy = legacy_path(memory_dir)
+    if not legacy.exists() or log_path(memory_dir).exists():
+        return 0
+
+    with locked(memory_dir):
+        if not legacy.exists() or log_path(memory_dir).exists():
+            return 0
+        try:
+            entries = json.loads(legacy.read_text(encoding="utf-8"))
+        except ValueError:
+            entries = []
+        if not isinstance(entries, list):
+            entries = []
+
+        entries = [e for e in entries if isinstance(e, dict)]
+        for entry in entries:
+            entry.setdefault("tokens", estimate_tokens(injection_line(entry)))
+        rewrite_entries(memory_dir, entries)
+        legacy.rename(legacy.with_name(LEGACY_NAME + MIGRATED_SUFFIX))
+    return len(entries)
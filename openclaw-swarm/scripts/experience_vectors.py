@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+经验的离线向量检索（字符 n-gram 特征哈希）
+
+不调用任何嵌入服务：把经验文本切成字符 2-gram / 3-gram，用哈希映射到固定维度，
+带符号累加后做 L2 归一化，余弦相似度即向量点积。对改写过措辞的经验
+（共享部分字词但关键词不完全一致）比 BM25 更宽容。
+
+向量保存在 memory/experience.vec，与 experience.jsonl 逐行对齐：
+
+    8 字节文件头（b"EVEC" + 版本 + 维度）+ 每条经验 DIM 个 float32
+
+安装了 NumPy 时以 memmap 映射整个矩阵，相似度为一次矩阵-向量乘法；
+未安装时退化为逐行计算（结果相同，只是慢一些）。
+向量文件只在第一次使用向量检索时生成，此后随写入追加、随整理重建；
+行数与存储条数不一致时自动重建。
+"""
+
+import math
+import heapq
+import struct
+import zlib
+from array import array
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+import experience_store as store
+from experience_index import entry_text
+
+VECTORS_NAME = "experience.vec"
+DIM = 1024
+NGRAMS = (2, 3)
+# 带符号的特征哈希会让毫不相关的文本也有少量正相似度（哈希碰撞）。
+# 不共享字符的随机文本之间 p99 约 0.075，低于该阈值的视为噪声
+MIN_SIMILARITY = 0.08
+
+_HEADER = struct.Struct("<4sHH")
+_MAGIC = b"EVEC"
+_VERSION = 1
+_ROW_BYTES = DIM * 4
+_CHUNK_ROWS = 1024  # 无 NumPy 时每次读入的行数
+
+
+def vectors_path(memory_dir: Path) -> Path:
+    return memory_dir / VECTORS_NAME
+
+
+def embed(text: str) -> array:
+    """文本的哈希 n-gram 向量（L2 归一化的 float32 数组，空文本为全零）"""
+    normalized = " ".join((text or "").lower().split())
+    vector = [0.0] * DIM
+    for n in NGRAMS:
+        for i in range(len(normalized) - n + 1):
+            gram = normalized[i:i + n]
+            if gram.isspace():
+                continue
+            h = zlib.crc32(gram.encode("utf-8"))
+            vector[h % DIM] += 1.0 if h >> 31 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm:
+        vector = [x / norm for x in vector]
+    return array("f", vector)
+
+
+def _encode_rows(entries: list) -> bytes:
+    return b"".join(embed(entry_text(e)).tobytes() for e in entries)
+
+
+def row_count(memory_dir: Path) -> int:
+    """向量文件中的行数；文件缺失或格式不符时为 -1"""
+    try:
+        with open(vectors_path(memory_dir), "rb") as f:
+            header = f.read(_HEADER.size)
+            size = f.seek(0, 2)
+    except FileNotFoundError:
+        return -1
+    if len(header) < _HEADER.size or _HEADER.unpack(header) != (_MAGIC, _VERSION, DIM):
+        return -1
+    return (size - _HEADER.size) // _ROW_BYTES
+
+
+def rebuild(memory_dir: Path, entries: list):
+    """按给定经验整体重写向量文件（须持有存储锁）"""
+    store.write_bytes_atomic(vectors_path(memory_dir),
+                             _HEADER.pack(_MAGIC, _VERSION, DIM) + _encode_rows(entries))
+
+
+def append(memory_dir: Path, entries: list):
+    """追加新经验的向量（须持有存储锁）；向量文件尚未启用时什么也不做"""
+    if entries and vectors_path(memory_dir).exists():
+        with open(vectors_path(memory_dir), "ab") as f:
+            f.write(_encode_rows(entries))
+
+
+def ensure(memory_dir: Path) -> int:
+    """确保向量文件存在且与存储对齐，返回行数"""
+    count = store.count_entries(memory_dir)
+    if row_count(memory_dir) != count:
+        with store.locked(memory_dir):
+            count = store.count_entries(memory_dir)
+            if row_count(memory_dir) != count:
+                rebuild(memory_dir, store.read_entries(memory_dir))
+    return count
+
+
+def _scores(memory_dir: Path, query: array, rows: int):
+    """查询向量与全部经验向量的点积"""
+    if np is not None:
+        matrix = np.memmap(vectors_path(memory_dir), dtype="<f4", mode="r",
+                           offset=_HEADER.size, shape=(rows, DIM))
+        return matrix @ np.frombuffer(query.tobytes(), dtype="<f4")
+
+    # 查询向量很稀疏，只取其非零维度参与计算
+    nonzero = [(j, x) for j, x in enumerate(query) if x]
+    scores = []
+    with open(vectors_path(memory_dir), "rb") as f:
+        f.seek(_HEADER.size)
+        for start in range(0, rows, _CHUNK_ROWS):
+            block = array("f", f.read(min(_CHUNK_ROWS, rows - start) * _ROW_BYTES))
+            for base in range(0, len(block), DIM):
+                scores.append(sum(block[base + j] * x for j, x in nonzero))
+    return scores
+
+
+def search(memory_dir: Path, query: str, limit: int = 5, recency_weight: float = 0.0,
+           min_similarity: float = MIN_SIMILARITY) -> list:
+    """
+    向量检索，返回 [(score, entry), ...]，按得分从高到低
+
+    score = (1 - recency_weight) * 余弦相似度 + recency_weight * 新近度，
+    新近度按写入顺序线性取值，最旧为 0、最新为 1。
+    只返回余弦相似度高于 min_similarity（至少为 0）的经验，先过滤再取前 limit 条。
+    """
+    threshold = max(min_similarity, 0.0)
+    query_vector = embed(query)
+    if limit <= 0 or not any(query_vector):
+        return []
+    rows = ensure(memory_dir)
+    if not rows:
+        return []
+
+    with store.locked(memory_dir, shared=True):
+        rows = min(rows, row_count(memory_dir))
+        if rows <= 0:
+            return []
+        similarity = _scores(memory_dir, query_vector, rows)
+
+        span = max(rows - 1, 1)
+        if np is not None:
+            recency = np.arange(rows, dtype="<f4") / span
+            combined = np.where(similarity > threshold,
+                                (1 - recency_weight) * similarity + recency_weight * recency, -np.inf)
+            k = min(limit, rows)
+            top = np.argpartition(-combined, k - 1)[:k]
+            ranked = [(float(combined[i]), int(i)) for i in top if similarity[i] > threshold]
+        else:
+            ranked = heapq.nlargest(limit, (
+                ((1 - recency_weight) * s + recency_weight * i / span, i)
+                for i, s in enumerate(similarity) if s > threshold
+            ))
+        ranked.sort(reverse=True)
+        entries = store.read_rows(memory_dir, [i for _, i in ranked])
+    return [(score, entries[i]) for score, i in ranked if i in entries]
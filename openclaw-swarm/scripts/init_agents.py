@@ -4,17 +4,32 @@
 
 用法:
     python init_agents.py [--base-path /workspace/agents]
+    python init_agents.py --dry-run                  # 只显示将要创建/更新的内容，不写文件
     
 提示词配置存储在 agent_souls.json 中，方便管理和观察。
+
+单个智能体的操作（--agent / --list）使用编译后的旁路缓存 .souls-cache/：
+    index.json      各智能体的名称、emoji 及其在 blob 中的偏移和长度，附带源文件的大小、mtime、哈希
+    <哈希>.blob     各智能体配置的 JSON 依次拼接
+源文件的大小或 mtime 变化时先比较哈希，内容确实变了才重新编译。
+--list 只读 index.json，--agent 只读取该智能体对应的字节。
+
+重复执行时只写入内容有变化的文件：<base>/.init-manifest.json 记录每个文件上次写入的
+内容哈希及大小、mtime；文件未被改动（大小、mtime 一致）时直接比较哈希，不读文件。
 """
 
 import os
 import json
+import time
+import hashlib
 import argparse
 
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SOULS_FILE = os.path.join(SCRIPT_DIR, "agent_souls.json")
+MANIFEST_NAME = ".init-manifest.json"
+SOULS_CACHE_DIR = os.path.join(SCRIPT_DIR, ".souls-cache")
+SOULS_CACHE_VERSION = 1
 
 
 def load_agent_souls():
@@ -26,20 +41,101 @@ def load_agent_souls():
         return json.load(f)
 
 
-def create_agent_workspace(base_path: str, agent_id: str, agent_info: dict):
-    """为单个智能体创建工作目录和基础文件"""
-    agent_path = os.path.join(base_path, agent_id)
-    os.makedirs(agent_path, exist_ok=True)
+def _souls_index_path() -> str:
+    return os.path.join(SOULS_CACHE_DIR, "index.json")
+
+
+def compile_souls(st: os.stat_result = None) -> dict:
+    """
+    解析 agent_souls.json 并生成旁路缓存，返回索引
+
+    缓存目录不可写时仍返回索引（blob 为 None），调用方退回完整解析。
+    """
+    with open(SOULS_FILE, "rb") as f:
+        raw = f.read()
+    st = st or os.stat(SOULS_FILE)
+    digest = hashlib.sha256(raw).hexdigest()
+    souls = json.loads(raw)
+    
+    chunks = []
+    agents = []
+    offset = 0
+    for agent_id, agent_info in souls.items():
+        data = json.dumps(agent_info, ensure_ascii=False).encode("utf-8")
+        agents.append({"id": agent_id, "name": agent_info.get("name", agent_id),
+                       "emoji": agent_info.get("emoji", "🤖"), "offset": offset, "length": len(data)})
+        chunks.append(data)
+        offset += len(data)
+    
+    index = {
+        "version": SOULS_CACHE_VERSION,
+        "source_size": st.st_size,
+        "source_mtime_ns": st.st_mtime_ns,
+        "source_hash": digest,
+        "blob": f"{digest[:16]}.blob",
+        "agents": agents,
+    }
+    try:
+        os.makedirs(SOULS_CACHE_DIR, exist_ok=True)
+        # blob 名随内容变化，正在读旧索引的进程仍能读到旧 blob（或找不到时退回完整解析）
+        _write_atomic(os.path.join(SOULS_CACHE_DIR, index["blob"]), b"".join(chunks))
+        _write_atomic(_souls_index_path(), json.dumps(index, ensure_ascii=False).encode("utf-8"))
+        for name in os.listdir(SOULS_CACHE_DIR):
+            if name.endswith(".blob") and name != index["blob"]:
+                os.remove(os.path.join(SOULS_CACHE_DIR, name))
+    except OSError:
+        index["blob"] = None
+    return index
+
+
+def load_souls_index() -> dict:
+    """读取智能体索引（不含 soul 文本）；源文件变化时重新编译"""
+    if not os.path.exists(SOULS_FILE):
+        raise FileNotFoundError(f"配置文件不存在: {SOULS_FILE}")
+    st = os.stat(SOULS_FILE)
+    
+    try:
+        with open(_souls_index_path(), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        index = None
+    if not isinstance(index, dict) or index.get("version") != SOULS_CACHE_VERSION:
+        return compile_souls(st)
     
-    # 创建 SOUL.md
-    soul_path = os.path.join(agent_path, "SOUL.md")
-    with open(soul_path, "w", encoding="utf-8") as f:
-        f.write(agent_info["soul"])
+    if (index["source_size"], index["source_mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+        return index
     
-    # 创建 AGENTS.md
-    agents_path = os.path.join(agent_path, "AGENTS.md")
-    with open(agents_path, "w", encoding="utf-8") as f:
-        f.write(f"""# AGENTS.md - {agent_info['name']} {agent_info['emoji']}
+    # mtime 变了但内容可能没变（如重新检出），比较哈希后只刷新记录
+    with open(SOULS_FILE, "rb") as f:
+        if hashlib.sha256(f.read()).hexdigest() != index["source_hash"]:
+            return compile_souls(st)
+    index["source_size"], index["source_mtime_ns"] = st.st_size, st.st_mtime_ns
+    try:
+        _write_atomic(_souls_index_path(), json.dumps(index, ensure_ascii=False).encode("utf-8"))
+    except OSError:
+        pass
+    return index
+
+
+def load_agent_soul(agent_id: str, index: dict = None) -> dict:
+    """只读取单个智能体的配置，不存在时返回 None"""
+    index = index or load_souls_index()
+    entry = next((a for a in index["agents"] if a["id"] == agent_id), None)
+    if entry is None:
+        return None
+    if index.get("blob"):
+        try:
+            with open(os.path.join(SOULS_CACHE_DIR, index["blob"]), "rb") as f:
+                f.seek(entry["offset"])
+                return json.loads(f.read(entry["length"]))
+        except (FileNotFoundError, ValueError):
+            pass
+    return load_agent_souls().get(agent_id)
+
+
+def render_agent_files(agent_info: dict) -> dict:
+    """渲染单个智能体的文件，返回 {文件名: 内容}"""
+    agents_content = f"""# AGENTS.md - {agent_info['name']} {agent_info['emoji']}
 
 ## 角色
 你是智能体团队中的 {agent_info['name']}。
@@ -53,9 +149,116 @@ def create_agent_workspace(base_path: str, agent_id: str, agent_info: dict):
 - 使用 Markdown 格式
 - 重要信息用标题和列表组织
 - 代码用代码块包裹
-""")
+"""
+    return {"SOUL.md": agent_info["soul"], "AGENTS.md": agents_content}
+
+
+def load_manifest(base_path: str) -> dict:
+    try:
+        with open(os.path.join(base_path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(base_path: str, manifest: dict):
+    path = os.path.join(base_path, MANIFEST_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _current_digest(path: str, recorded: dict) -> str:
+    """磁盘上文件的内容哈希；大小和 mtime 与清单记录一致时直接沿用记录，不读文件"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if recorded and recorded.get("size") == st.st_size and recorded.get("mtime_ns") == st.st_mtime_ns:
+        return recorded["hash"]
+    with open(path, "rb") as f:
+        return _digest(f.read())
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def create_agent_workspace(base_path: str, agent_id: str, agent_info: dict,
+                           manifest: dict = None, dry_run: bool = False) -> dict:
+    """
+    为单个智能体创建 / 更新工作目录和基础文件，只写入内容有变化的文件
+
+    manifest 为 .init-manifest.json 的内容，会就地更新本智能体的记录。
+    返回 {"status": created / updated / unchanged, "files": 写入（或将写入）的文件}。
+    """
+    manifest = manifest if manifest is not None else {}
+    agent_path = os.path.join(base_path, agent_id)
+    exists = os.path.isdir(agent_path)
+    records = manifest.get(agent_id, {})
+    new_records = {}
+    changed = []
+    
+    for name, content in render_agent_files(agent_info).items():
+        data = content.encode("utf-8")
+        digest = _digest(data)
+        path = os.path.join(agent_path, name)
+        if _current_digest(path, records.get(name)) != digest:
+            changed.append(name)
+            if not dry_run:
+                os.makedirs(agent_path, exist_ok=True)
+                _write_atomic(path, data)
+        if not dry_run:
+            st = os.stat(path)
+            new_records[name] = {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    
+    if not dry_run:
+        manifest[agent_id] = new_records
+    
+    status = "created" if not exists else ("updated" if changed else "unchanged")
+    return {"status": status, "files": changed}
+
+
+STATUS_ICONS = {"created": "✅", "updated": "🔄", "unchanged": "⏸️"}
+STATUS_LABELS = {"created": "创建", "updated": "更新", "unchanged": "未变化"}
+
+
+def init_workspaces(base_path: str, agents: dict, dry_run: bool = False) -> dict:
+    """初始化（或增量更新）一组智能体，逐个打印状态，返回汇总"""
+    start = time.perf_counter()
+    manifest = load_manifest(base_path)
+    before = json.dumps(manifest, sort_keys=True)
+    counts = {status: 0 for status in STATUS_LABELS}
+    
+    if not dry_run:
+        os.makedirs(base_path, exist_ok=True)
+    for agent_id, agent_info in agents.items():
+        result = create_agent_workspace(base_path, agent_id, agent_info, manifest, dry_run)
+        counts[result["status"]] += 1
+        files = f" [{', '.join(result['files'])}]" if result["status"] == "updated" else ""
+        print(f"  {STATUS_ICONS[result['status']]} {agent_info['emoji']} {agent_id} "
+              f"({agent_info['name']}) {STATUS_LABELS[result['status']]}{files}")
     
-    print(f"  ✅ {agent_info['emoji']} {agent_id} ({agent_info['name']})")
+    if not dry_run and json.dumps(manifest, sort_keys=True) != before:
+        save_manifest(base_path, manifest)
+    
+    counts["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return counts
+
+
+def format_summary(counts: dict, dry_run: bool = False) -> str:
+    prefix = "将" if dry_run else ""
+    return (f"{prefix}创建 {counts['created']} 个 · {prefix}更新 {counts['updated']} 个 · "
+            f"未变化 {counts['unchanged']} 个 · 耗时 {counts['elapsed_ms']} ms")
 
 
 def main():
@@ -69,6 +272,11 @@ def main():
         "--agent",
         help="只初始化指定的智能体 (可选)"
     )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="只显示将要创建 / 更新的智能体，不写入文件"
+    )
     parser.add_argument(
         "--list",
         action="store_true",
@@ -76,49 +284,58 @@ def main():
     )
     args = parser.parse_args()
     
-    # 加载配置
-    try:
-        agents = load_agent_souls()
-    except FileNotFoundError as e:
-        print(f"❌ 错误: {e}")
-        return 1
-    
-    # 列出模式
+    # 列出模式：只读索引，不加载 soul 文本
     if args.list:
+        try:
+            index = load_souls_index()
+        except FileNotFoundError as e:
+            print(f"❌ 错误: {e}")
+            return 1
         print("\n📋 可用智能体列表:\n")
-        for agent_id, agent_info in agents.items():
-            print(f"  {agent_info['emoji']} {agent_id:12} - {agent_info['name']}")
-        print(f"\n共 {len(agents)} 个智能体")
+        for agent in index["agents"]:
+            print(f"  {agent['emoji']} {agent['id']:12} - {agent['name']}")
+        print(f"\n共 {len(index['agents'])} 个智能体")
         print(f"配置文件: {SOULS_FILE}")
         return 0
     
     # 初始化模式
     if args.agent:
-        # 只初始化指定智能体
-        if args.agent not in agents:
+        # 只初始化指定智能体：只读取它的那一段配置
+        try:
+            index = load_souls_index()
+        except FileNotFoundError as e:
+            print(f"❌ 错误: {e}")
+            return 1
+        agent_info = load_agent_soul(args.agent, index)
+        if agent_info is None:
             print(f"❌ 错误: 未找到智能体 '{args.agent}'")
-            print(f"   可用: {', '.join(agents.keys())}")
+            print(f"   可用: {', '.join(a['id'] for a in index['agents'])}")
             return 1
         
-        print(f"\n🚀 初始化智能体: {args.agent}")
+        print(f"\n🚀 初始化智能体: {args.agent}{'（预览）' if args.dry_run else ''}")
         print(f"   路径: {args.base_path}\n")
         
-        os.makedirs(args.base_path, exist_ok=True)
-        create_agent_workspace(args.base_path, args.agent, agents[args.agent])
+        counts = init_workspaces(args.base_path, {args.agent: agent_info}, args.dry_run)
         
-        print(f"\n✨ 完成！")
+        print(f"\n✨ 完成！{format_summary(counts, args.dry_run)}")
     else:
         # 初始化所有智能体
-        print(f"\n🚀 初始化多智能体团队工作目录")
+        try:
+            agents = load_agent_souls()
+        except FileNotFoundError as e:
+            print(f"❌ 错误: {e}")
+            return 1
+        
+        print(f"\n🚀 初始化多智能体团队工作目录{'（预览）' if args.dry_run else ''}")
         print(f"   路径: {args.base_path}")
         print(f"   配置: {SOULS_FILE}\n")
         
-        os.makedirs(args.base_path, exist_ok=True)
+        counts = init_workspaces(args.base_path, agents, args.dry_run)
         
-        for agent_id, agent_info in agents.items():
-            create_agent_workspace(args.base_path, agent_id, agent_info)
-        
-        print(f"\n✨ 完成！共创建 {len(agents)} 个智能体工作目录")
+        print(f"\n✨ 完成！{format_summary(counts, args.dry_run)}")
+    
+    if args.dry_run:
+        return 0
     
     print(f"\n下一步:")
     print(f"  1. 在 openclaw.json 中添加智能体配置")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+智能体模型分配求解
+
+按成本 / 延迟为每个角色挑选模型，替代"每个等级取第一个模型"的朴素分配：
+
+    cost     在延迟上限（--latency-slo，可选）内使每次运行的预期花费最小
+    latency  在预算（--budget，可选）内使各角色 p95 延迟的最大值最小
+             （并行阶段的等待时间由最慢的角色决定）
+
+候选模型：等级不低于角色要求（高等级模型可以承担低等级角色），上下文窗口能容纳
+该角色单次调用的最大输入；designer 只在图像模型中选择，其他角色不使用图像生成模型。
+
+输入数据：
+    - 模型价格：openclaw.json 中模型的 cost.input / cost.output（$/M tokens），
+      --profile 文件可覆盖；都没有时按等级取 SKILL.md 中的参考价格
+    - 模型速度：--profile 中的 ttft_s（首 token 秒数）/ tokens_per_s，缺省按等级估计
+    - 角色用量：--stats 运行统计（JSONL，每行一次 spawn：
+      {"run": "...", "agent": "researcher", "input_tokens": 9000, "output_tokens": 1000}），
+      缺省用统计模板中的示例值
+
+p95 延迟 = ttft_s + 单次输出 token 的 p95 / tokens_per_s。
+"""
+
+import json
+import math
+
+TIER_RANK = {"low": 0, "mid": 1, "high": 2}
+IMAGE_ROLES = {"designer"}
+
+# 按等级的参考价格 ($/M tokens，input, output)，见 SKILL.md「模型成本参考」
+TIER_PRICES = {"high": (5.0, 25.0), "mid": (1.25, 10.0), "low": (0.014, 0.014)}
+# 按等级估计的速度 (首 token 秒数, 输出 token/s)
+TIER_SPEED = {"high": (2.0, 40.0), "mid": (1.0, 80.0), "low": (0.5, 120.0)}
+
+# 每次运行的默认用量（见 references/statistics-template.md 的示例）
+DEFAULT_VOLUME = {"input": 10000, "output": 1500, "spawn_input": 10000, "spawn_output": 1500}
+DEFAULT_ROLE_VOLUMES = {
+    "researcher": {"input": 17000, "output": 2200, "spawn_input": 9000, "spawn_output": 1200},
+    "writer": {"input": 15000, "output": 2500, "spawn_input": 15000, "spawn_output": 2500},
+    "designer": {"input": 2000, "output": 0, "spawn_input": 2000, "spawn_output": 0},
+}
+
+
+def load_json_records(path: str) -> list:
+    """读取 JSON 列表或 JSONL 文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def load_profile(path: str) -> dict:
+    """模型信息覆盖：{full_id: {"cost": {"input", "output"}, "ttft_s", "tokens_per_s", ...}}"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _p95(values: list) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(len(ordered) * 0.95) - 1, 0)]
+
+
+def role_volumes(records: list, roles: dict) -> dict:
+    """
+    每个角色每次运行的预期用量
+
+    input / output 为每次运行的 token 总量（总量 / 运行次数），
+    spawn_input 为单次调用的最大输入，spawn_output 为单次输出的 p95。
+    没有统计数据的角色使用默认值。
+    """
+    runs = {str(r.get("run", "")) for r in records} or {""}
+    spawns = {}
+    for r in records:
+        spawns.setdefault(r.get("agent"), []).append(
+            (int(r.get("input_tokens", 0) or 0), int(r.get("output_tokens", 0) or 0)))
+
+    volumes = {}
+    for role_id in roles:
+        items = spawns.get(role_id)
+        if items:
+            volumes[role_id] = {
+                "input": sum(i for i, _ in items) / len(runs),
+                "output": sum(o for _, o in items) / len(runs),
+                "spawn_input": max(i for i, _ in items),
+                "spawn_output": _p95([o for _, o in items]),
+                "source": "stats",
+            }
+        else:
+            volumes[role_id] = dict(DEFAULT_ROLE_VOLUMES.get(role_id, DEFAULT_VOLUME), source="default")
+    return volumes
+
+
+def model_profile(model: dict, override: dict = None) -> dict:
+    """模型的价格与速度（依次取 profile 覆盖、openclaw.json、等级参考值）"""
+    override = override or {}
+    cost = override.get("cost") or model.get("cost") or {}
+    prices = TIER_PRICES[model["tier"]]
+    speed = TIER_SPEED[model["tier"]]
+    has_cost = "input" in cost and "output" in cost
+    return {
+        "input_price": float(cost["input"]) if has_cost else prices[0],
+        "output_price": float(cost["output"]) if has_cost else prices[1],
+        "ttft_s": float(override.get("ttft_s", speed[0])),
+        "tokens_per_s": float(override.get("tokens_per_s", speed[1])),
+        "cost_source": ("profile" if override.get("cost") else "config") if has_cost else "tier",
+    }
+
+
+def role_cost(profile: dict, volume: dict) -> float:
+    return (volume["input"] * profile["input_price"] + volume["output"] * profile["output_price"]) / 1e6
+
+
+def role_latency(profile: dict, volume: dict) -> float:
+    return profile["ttft_s"] + volume["spawn_output"] / profile["tokens_per_s"]
+
+
+def candidates(role_id: str, role: dict, volume: dict, models: list) -> list:
+    """角色可用的模型（保持配置中的顺序）"""
+    if role_id in IMAGE_ROLES:
+        pool = [m for m in models if m["image_output"]] or [m for m in models if m["supports_image"]]
+        if pool:
+            return pool
+    floor = TIER_RANK[role.get("tier", "mid")]
+    text_models = [m for m in models if not m["image_output"]] or list(models)
+    pool = [m for m in text_models if TIER_RANK[m["tier"]] >= floor] or text_models
+    fits = [m for m in pool if not m["context_window"] or m["context_window"] >= volume["spawn_input"]]
+    return fits or pool
+
+
+def _options(models: list, roles: dict, volumes: dict, overrides: dict) -> dict:
+    """每个角色的候选 [(成本, 延迟, 模型 ID), ...]"""
+    profiles = {m["full_id"]: model_profile(m, overrides.get(m["full_id"])) for m in models}
+    options = {}
+    for role_id, role in roles.items():
+        volume = volumes[role_id]
+        options[role_id] = [
+            (role_cost(profiles[m["full_id"]], volume), role_latency(profiles[m["full_id"]], volume), m["full_id"])
+            for m in candidates(role_id, role, volume, models)
+        ]
+    return options
+
+
+def _cheapest_within(options: dict, limit: float) -> dict:
+    """每个角色在延迟不超过 limit 的候选中取最便宜的；某个角色无候选时返回 None"""
+    picks = {}
+    for role_id, opts in options.items():
+        within = [o for o in opts if o[1] <= limit]
+        if not within:
+            return None
+        picks[role_id] = min(within, key=lambda o: (o[0], o[1]))
+    return picks
+
+
+def _summary(picks: dict) -> dict:
+    return {
+        "assignments": {role_id: o[2] for role_id, o in picks.items()},
+        "cost": sum(o[0] for o in picks.values()),
+        "p95_latency_s": max((o[1] for o in picks.values()), default=0.0),
+        "roles": {role_id: {"model": o[2], "cost": o[0], "p95_latency_s": o[1]} for role_id, o in picks.items()},
+    }
+
+
+def solve(models: list, roles: dict, volumes: dict, objective: str = "cost",
+          budget: float = None, latency_slo: float = None, overrides: dict = None) -> dict:
+    """
+    求解分配，返回 {"assignments", "cost", "p95_latency_s", "roles", "feasible"}
+
+    cost 为每次运行的预期花费（美元）。约束无法满足时 feasible 为 False，
+    返回最接近的分配（cost 目标取各角色延迟最小的模型，latency 目标取最便宜的模型）。
+    """
+    options = {role_id: opts for role_id, opts in _options(models, roles, volumes, overrides or {}).items() if opts}
+    if not options:
+        return dict(_summary({}), feasible=True)
+
+    if objective == "cost":
+        limit = latency_slo if latency_slo is not None else math.inf
+        picks = {}
+        feasible = True
+        for role_id, opts in options.items():
+            within = [o for o in opts if o[1] <= limit]
+            if not within:
+                feasible = False
+                within = [min(opts, key=lambda o: (o[1], o[0]))]
+            picks[role_id] = min(within, key=lambda o: (o[0], o[1]))
+        result = _summary(picks)
+        if budget is not None and result["cost"] > budget:
+            feasible = False
+        return dict(result, feasible=feasible)
+
+    if objective == "latency":
+        # 可行性随延迟上限单调：二分查找满足预算的最小上限
+        limits = sorted({o[1] for opts in options.values() for o in opts})
+        lo, hi = 0, len(limits) - 1
+        best = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            picks = _cheapest_within(options, limits[mid])
+            if picks is not None and (budget is None or sum(o[0] for o in picks.values()) <= budget):
+                best = picks
+                hi = mid - 1
+            else:
+                lo = mid + 1
+        if best is not None:
+            return dict(_summary(best), feasible=True)
+        return dict(_summary(_cheapest_within(options, math.inf)), feasible=False)
+
+    raise ValueError(f"未知的优化目标: {objective}")
+
+
+def evaluate(assignments: dict, models: list, roles: dict, volumes: dict, overrides: dict = None) -> dict:
+    """给定分配的预期花费与延迟（格式同 solve）"""
+    by_id = {m["full_id"]: m for m in models}
+    overrides = overrides or {}
+    picks = {}
+    for role_id, model_id in assignments.items():
+        if role_id in roles and model_id in by_id:
+            profile = model_profile(by_id[model_id], overrides.get(model_id))
+            picks[role_id] = (role_cost(profile, volumes[role_id]), role_latency(profile, volumes[role_id]), model_id)
+    return _summary(picks)
+
+
+def compare(naive: dict, solved: dict) -> dict:
+    """求解结果相对朴素分配的差异"""
+    saved = naive["cost"] - solved["cost"]
+    return {
+        "naive_cost": round(naive["cost"], 6),
+        "solved_cost": round(solved["cost"], 6),
+        "cost_saved": round(saved, 6),
+        "cost_saved_pct": round(saved / naive["cost"] * 100, 1) if naive["cost"] else 0.0,
+        "naive_p95_latency_s": round(naive["p95_latency_s"], 2),
+        "solved_p95_latency_s": round(solved["p95_latency_s"], 2),
+        "changed": sorted(role_id for role_id, model_id in solved["assignments"].items()
+                          if naive["assignments"].get(role_id) != model_id),
+    }
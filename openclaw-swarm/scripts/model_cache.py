@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+OpenClaw 模型检测缓存
+
+swarm_entry.py 和 setup_wizard.py 都要从 openclaw.json 中读出模型并按等级分类。
+分类结果按调用方分别缓存在 <skill>/.models-cache/<名称>.json：
+
+    {"source": [路径, mtime_ns, 大小], "code": "分类代码各文件的 mtime:大小", "result": 分类结果}
+
+openclaw.json 与分类代码都未变化时直接返回缓存的结果，不重新解析和分类。
+"""
+
+import os
+import json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SKILL_DIR = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(SKILL_DIR, ".models-cache")
+
+# openclaw.json 的候选位置（按顺序取第一个存在的）
+DEFAULT_CONFIG_PATHS = [
+    os.path.expanduser("~/.openclaw/openclaw.json"),
+    "/root/.openclaw/openclaw.json",
+]
+
+
+def _stat_key(path: str) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def find_config(paths: list = None):
+    """第一个存在的 openclaw.json，返回 (路径, stat 结果)，都不存在时为 (None, None)"""
+    for path in paths or DEFAULT_CONFIG_PATHS:
+        try:
+            return str(path), os.stat(path)
+        except OSError:
+            continue
+    return None, None
+
+
+def _cache_file(name: str) -> str:
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+
+def _load_cache(name: str) -> dict:
+    try:
+        with open(_cache_file(name), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        return entry if isinstance(entry, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(name: str, entry: dict):
+    path = _cache_file(name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def cached_models(name: str, classify, paths: list = None, depends: list = None):
+    """
+    返回 (classify(openclaw 配置) 的结果, 配置文件路径)
+
+    name 区分不同调用方的分类方式；depends 为 classify 依赖的其他源文件，
+    它们与 classify 所在文件有改动时缓存失效。配置文件不存在或无法解析时为 (classify(None), 路径或 None)，
+    这种情况不缓存。
+    """
+    path, st = find_config(paths)
+    if path is None:
+        return classify(None), None
+
+    source = [path, st.st_mtime_ns, st.st_size]
+    code = ",".join(_stat_key(f) for f in [classify.__code__.co_filename] + list(depends or []))
+    entry = _load_cache(name)
+    if entry.get("source") == source and entry.get("code") == code:
+        return entry["result"], path
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return classify(None), path
+
+    result = classify(config)
+    _save_cache(name, {"source": source, "code": code, "result": result})
+    return result, path
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+统一的模型分级规则
+
+swarm_entry.py 和 setup_wizard.py 共用同一张规则表。规则按优先级排列，
+编译为一个带命名分组的正则，对 "<模型 ID> <模型名称>"（小写）只扫描一遍：
+
+    image  名称含 image          → 图像生成模型（另行标记，等级仍按后续规则判断）
+    low    mini/flash/lite/...   → 轻量
+    high   opus/gpt-4/...        → 高性能
+    mid    sonnet/gemini/pro     → 中等
+
+关键词与原先两处的 `x in name` 一样按子串匹配（chatglm 命中 glm）。正则从左到右
+不重叠地扫描，同一位置按表中顺序取第一个能匹配的词，所以较长的词先被整体消耗：
+gemini 命中 mid 而不会再命中其中的 mini；ignore 组列出含有关键词、但不属于该等级的
+模型名（minimax 不是 mini），匹配后忽略。
+同一模型命中多个等级时取优先级最高的（gpt-4o-mini → low，gemini-2.5-flash → low）。
+没有命中任何关键词时参考能力元数据：reasoning 为真 → high，
+上下文窗口小于 SMALL_CONTEXT → low，否则 mid。
+
+每个模型只扫描一遍编译好的正则；拼接全部模型文本一次扫描实测并不更快，所以没有单独的批量路径。
+
+--check 除已知模型的期望结果外，还对照两个旧分类器（swarm_entry.detect_models 按名称、
+setup_wizard.get_available_models 按 ID）在基线代码上记录的输出：每一处不同都必须在
+DELIBERATE_DIFFERENCES 中写明原因，未列出的差异和已不再成立的条目都算失败。
+"""
+
+import re
+import sys
+import json
+import argparse
+
+# (类别, 关键词正则片段)，按优先级从高到低
+RULES = [
+    ("ignore", ["minimax"]),
+    ("image", ["image"]),
+    ("low", ["mini", "flash", "lite", "nano", "haiku", "glm", "deepseek", "qwen"]),
+    ("high", ["opus", "gpt-4", "gpt-5", "claude-4"]),
+    ("mid", ["sonnet", "gemini", r"pro(?![a-z])"]),
+]
+TIERS = ("high", "mid", "low")
+TIER_PRECEDENCE = [name for name, _ in RULES if name in TIERS]
+SMALL_CONTEXT = 32000
+
+_PATTERN = re.compile("|".join(f"(?P<{name}>{'|'.join(words)})" for name, words in RULES))
+
+# 已知模型的期望结果（--check 时校验）：(模型 ID, 名称, 元数据, 期望等级, 是否图像模型)
+EXAMPLES = [
+    ("aws-claude-opus-4-5", "Claude Opus 4.5", {}, "high", False),
+    ("claude-sonnet-4", "Claude Sonnet 4", {}, "mid", False),
+    ("gemini-3-pro-preview", "Gemini 3 Pro", {"reasoning": True}, "mid", False),
+    ("gemini-3-pro-image-preview", "Gemini 3 Pro Image", {}, "mid", True),
+    ("gemini-2.5-flash", "Gemini 2.5 Flash", {}, "low", False),
+    ("Kivy-GLM-4.7", "GLM-4.7", {}, "low", False),
+    ("chatglm3-6b", "ChatGLM3 6B", {}, "low", False),
+    ("minimax-m2", "MiniMax M2", {}, "mid", False),
+    ("gemini-2.0-flash-lite", "Gemini 2.0 Flash Lite", {}, "low", False),
+    ("imagen-4", "Imagen 4", {}, "mid", True),
+    ("gpt-4o", "GPT-4o", {}, "high", False),
+    ("gpt-4o-mini", "GPT-4o mini", {}, "low", False),
+    ("deepseek-chat", "DeepSeek V3", {}, "low", False),
+    ("qwen-max", "Qwen Max", {}, "low", False),
+    ("llama-3-70b", "Llama 3 70B", {}, "mid", False),
+    ("o3", "o3", {"reasoning": True}, "high", False),
+    ("tiny-chat", "Tiny Chat", {"contextWindow": 8192}, "low", False),
+    ("prompt-guard", "Prompt Guard", {}, "mid", False),
+]
+
+
+# 两个旧分类器在基线代码上的实际输出：(模型 ID, 名称, swarm_entry 分类, setup_wizard 等级)
+# swarm_entry 分类为 high / medium / light / image，setup_wizard 只有 high / mid / low
+LEGACY_OUTPUTS = [
+    ("aws-claude-opus-4-5", "Claude Opus 4.5", "high", "high"),
+    ("claude-sonnet-4", "Claude Sonnet 4", "medium", "mid"),
+    ("claude-3-5-haiku", "Claude 3.5 Haiku", "medium", "mid"),
+    ("gpt-4o", "GPT-4o", "high", "high"),
+    ("gpt-4o-mini", "GPT-4o mini", "high", "high"),
+    ("gpt-4.1-nano", "GPT-4.1 nano", "high", "high"),
+    ("gpt-5", "GPT-5", "medium", "mid"),
+    ("gemini-2.5-pro", "Gemini 2.5 Pro", "medium", "high"),
+    ("gemini-3-pro-preview", "Gemini 3 Pro", "medium", "high"),
+    ("gemini-2.5-flash", "Gemini 2.5 Flash", "medium", "low"),
+    ("gemini-2.0-flash-lite", "Gemini 2.0 Flash Lite", "medium", "low"),
+    ("gemini-3-pro-image-preview", "Gemini 3 Pro Image", "image", "high"),
+    ("Kivy-GLM-4.7", "GLM-4.7", "light", "low"),
+    ("chatglm3-6b", "ChatGLM3 6B", "light", "low"),
+    ("deepseek-chat", "DeepSeek V3", "light", "mid"),
+    ("qwen-max", "Qwen Max", "light", "mid"),
+    ("llama-3-70b", "Llama 3 70B", "medium", "mid"),
+    ("minimax-m2", "MiniMax M2", "medium", "low"),
+    ("mistral-large", "Mistral Large", "medium", "mid"),
+    ("imagen-4", "Imagen 4", "image", "mid"),
+    ("prompt-guard", "Prompt Guard", "medium", "high"),
+]
+LEGACY_TIERS = {"high": "high", "medium": "mid", "light": "low", "mid": "mid", "low": "low"}
+
+# 与旧输出有意不同之处：{(模型 ID, 旧分类器): 原因}
+DELIBERATE_DIFFERENCES = {
+    ("claude-3-5-haiku", "swarm_entry"): "haiku 为轻量模型（新增关键词）",
+    ("claude-3-5-haiku", "setup_wizard"): "haiku 为轻量模型（新增关键词）",
+    ("gpt-4o-mini", "swarm_entry"): "mini 等轻量关键词优先于 gpt-4",
+    ("gpt-4o-mini", "setup_wizard"): "mini 等轻量关键词优先于 gpt-4",
+    ("gpt-4.1-nano", "swarm_entry"): "nano 为轻量模型，且优先于 gpt-4",
+    ("gpt-4.1-nano", "setup_wizard"): "nano 为轻量模型，且优先于 gpt-4",
+    ("gpt-5", "swarm_entry"): "gpt-5 为高性能模型（新增关键词）",
+    ("gpt-5", "setup_wizard"): "gpt-5 为高性能模型（新增关键词）",
+    ("gemini-2.5-flash", "swarm_entry"): "flash 为轻量模型（与 setup_wizard 一致）",
+    ("gemini-2.0-flash-lite", "swarm_entry"): "flash / lite 为轻量模型（与 setup_wizard 一致）",
+    ("gemini-2.5-pro", "setup_wizard"): "pro 为中等模型（与 swarm_entry、SKILL.md 一致）",
+    ("gemini-3-pro-preview", "setup_wizard"): "pro 为中等模型（与 swarm_entry、SKILL.md 一致）",
+    ("gemini-3-pro-image-preview", "setup_wizard"): "pro 为中等模型；图像模型另行标记",
+    ("deepseek-chat", "setup_wizard"): "deepseek 为轻量模型（与 swarm_entry 一致）",
+    ("qwen-max", "setup_wizard"): "qwen 为轻量模型（与 swarm_entry 一致）",
+    ("minimax-m2", "setup_wizard"): "minimax 不是 mini",
+    ("prompt-guard", "setup_wizard"): "pro 只按完整的词匹配，prompt 不算",
+}
+
+def _text(model: dict) -> str:
+    model_id = model.get("id", "")
+    return f"{model_id} {model.get('name', model_id)}".lower().replace("\n", " ")
+
+
+def _result(model: dict, hits: set) -> dict:
+    tier = next((t for t in TIER_PRECEDENCE if t in hits), None)
+    if tier is None:
+        context_window = model.get("contextWindow", 0) or 0
+        if model.get("reasoning"):
+            tier = "high"
+        elif 0 < context_window < SMALL_CONTEXT:
+            tier = "low"
+        else:
+            tier = "mid"
+    return {"tier": tier, "image_output": "image" in hits}
+
+
+def classify_model(model: dict) -> dict:
+    """单个模型（openclaw.json 中的模型配置）的等级，返回 {"tier", "image_output"}"""
+    hits = {m.lastgroup for m in _PATTERN.finditer(_text(model))}
+    return _result(model, hits)
+
+
+def classify_config(config: dict) -> list:
+    """
+    openclaw.json 中全部模型的分级与能力信息（按配置中的顺序）
+
+    每项包含 full_id / provider_id / model_id / name / tier / image_output /
+    supports_image / reasoning / context_window / cost（配置中的价格，没有时为 None）。
+    """
+    if not config:
+        return []
+    flat = []
+    for provider_id, provider_config in config.get("models", {}).get("providers", {}).items():
+        for model in provider_config.get("models", []):
+            flat.append((provider_id, model))
+
+    records = []
+    for provider_id, model in flat:
+        result = classify_model(model)
+        model_id = model.get("id", "")
+        records.append({
+            "full_id": f"{provider_id}/{model_id}",
+            "provider_id": provider_id,
+            "model_id": model_id,
+            "name": model.get("name", model_id),
+            "tier": result["tier"],
+            "image_output": result["image_output"],
+            "supports_image": "image" in model.get("input", []),
+            "reasoning": model.get("reasoning", False),
+            "context_window": model.get("contextWindow", 0),
+            "cost": model.get("cost"),
+        })
+    return records
+
+
+def legacy_differences() -> list:
+    """与两个旧分类器记录输出的差异：[(模型 ID, 旧分类器, 旧结果, 新结果), ...]"""
+    differences = []
+    for model_id, name, entry_class, wizard_tier in LEGACY_OUTPUTS:
+        got = classify_model({"id": model_id, "name": name})
+        if entry_class == "image":
+            same = got["image_output"]
+        else:
+            same = not got["image_output"] and got["tier"] == LEGACY_TIERS[entry_class]
+        if not same:
+            differences.append((model_id, "swarm_entry", entry_class, got["tier"]))
+        if got["tier"] != LEGACY_TIERS[wizard_tier]:
+            differences.append((model_id, "setup_wizard", wizard_tier, got["tier"]))
+    return differences
+
+
+def check() -> dict:
+    """校验规则表：已知模型的期望结果，以及与旧分类器记录输出的差异是否都已列明"""
+    failures = []
+    for model_id, name, meta, tier, image in EXAMPLES:
+        got = classify_model(dict(meta, id=model_id, name=name))
+        if got != {"tier": tier, "image_output": image}:
+            failures.append({"id": model_id, "expected": [tier, image], "got": [got["tier"], got["image_output"]]})
+
+    differences = legacy_differences()
+    found = {(model_id, source) for model_id, source, _, _ in differences}
+    unexpected = [{"id": model_id, "classifier": source, "legacy": old, "got": new}
+                  for model_id, source, old, new in differences
+                  if (model_id, source) not in DELIBERATE_DIFFERENCES]
+    stale = [{"id": model_id, "classifier": source}
+             for model_id, source in DELIBERATE_DIFFERENCES if (model_id, source) not in found]
+
+    return {
+        "examples": len(EXAMPLES),
+        "legacy_models": len(LEGACY_OUTPUTS),
+        "deliberate_differences": len(DELIBERATE_DIFFERENCES),
+        "failures": failures,
+        "unexpected_differences": unexpected,
+        "stale_differences": stale,
+        "ok": not failures and not unexpected and not stale,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型分级")
+    parser.add_argument("--check", action="store_true", help="校验规则表（已知模型与旧分类器的记录输出）")
+    parser.add_argument("--config", help="对指定的 openclaw.json 分级并输出结果")
+    args = parser.parse_args()
+
+    if args.check:
+        result = check()
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result["ok"] else 1)
+
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            print(json.dumps(classify_config(json.load(f)), ensure_ascii=False, indent=2))
+        return
+
+    parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+角色模型池与本地路由
+
+配置向导为每个角色生成一个模型池（<skill>/routing-pools.json）：
+
+    {"version": 1, "roles": {"researcher": {"models": [
+        {"id": "g/gemini-2.5-flash", "weight": 4, "max_concurrency": 4},   # 首选
+        {"id": "z/glm-4.7", "weight": 4, "max_concurrency": 4},            # 备选，按顺序
+        ...]}}}
+
+池中是与首选模型同等级（且同为 / 同不为图像生成模型）的候选，不同提供商优先（限流通常按提供商计算）。
+写入 openclaw.json 的补丁中对应 model.primary / model.fallbacks；
+权重与并发上限只供本地路由使用。
+
+编排器每次 spawn 前调用 pick 取得模型和租约，结束后 release：
+
+    python model_router.py pick researcher        # {"model": "...", "lease": "..."}
+    python model_router.py release <lease>
+    python model_router.py fail <lease> --cooldown 60   # 遇到限流：释放并暂停该模型 60 秒
+    python model_router.py status
+
+pick 在未达并发上限、未处于冷却中的模型里选 负载 / 权重 最小的一个（相同时按池中顺序）；
+全部不可用时返回 model 为 null。进行中的租约保存在 <skill>/.router-state.json，
+读写在 fcntl 锁内完成；超过 LEASE_TTL 秒未释放的租约视为已结束。
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import argparse
+from contextlib import contextmanager
+
+import model_assignment
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SKILL_DIR = os.path.dirname(SCRIPT_DIR)
+POOLS_FILE = os.path.join(SKILL_DIR, "routing-pools.json")
+STATE_FILE = os.path.join(SKILL_DIR, ".router-state.json")
+
+POOLS_VERSION = 1
+DEFAULT_POOL_SIZE = 3
+DEFAULT_CONCURRENCY = 4
+LEASE_TTL = 30 * 60
+
+
+def build_pools(models: list, roles: dict, volumes: dict, assignments: dict,
+                size: int = DEFAULT_POOL_SIZE, overrides: dict = None) -> dict:
+    """
+    为每个已分配的角色生成模型池：首选模型 + 同等级的候选（其他提供商优先，再按成本）
+
+    overrides 中模型的 max_concurrency / weight 覆盖默认值（权重默认等于并发上限）。
+    """
+    overrides = overrides or {}
+    by_id = {m["full_id"]: m for m in models}
+    roles_out = {}
+    for role_id, primary_id in assignments.items():
+        primary = by_id.get(primary_id)
+        if primary is None or role_id not in roles:
+            continue
+        volume = volumes[role_id]
+        peers = []
+        for m in model_assignment.candidates(role_id, roles[role_id], volume, models):
+            if m["full_id"] != primary_id and m["tier"] == primary["tier"] \
+                    and m["image_output"] == primary["image_output"]:
+                profile = model_assignment.model_profile(m, overrides.get(m["full_id"]))
+                peers.append((model_assignment.role_cost(profile, volume), len(peers), m))
+
+        chosen = [primary]
+        used_providers = {primary["provider_id"]}
+        while peers and len(chosen) < size:
+            best = min(peers, key=lambda p: (p[2]["provider_id"] in used_providers, p[0], p[1]))
+            peers.remove(best)
+            chosen.append(best[2])
+            used_providers.add(best[2]["provider_id"])
+
+        entries = []
+        for m in chosen:
+            override = overrides.get(m["full_id"], {})
+            cap = int(override.get("max_concurrency", DEFAULT_CONCURRENCY))
+            entries.append({"id": m["full_id"], "weight": float(override.get("weight", cap)),
+                            "max_concurrency": cap})
+        roles_out[role_id] = {"models": entries}
+    return {"version": POOLS_VERSION, "roles": roles_out}
+
+
+def save_pools(pools: dict, path: str = POOLS_FILE):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(pools, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load_pools(path: str = POOLS_FILE) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        pools = json.load(f)
+    if pools.get("version") != POOLS_VERSION:
+        raise ValueError(f"不支持的模型池版本: {pools.get('version')}")
+    return pools
+
+
+@contextmanager
+def _state(path: str = STATE_FILE):
+    """加锁读取路由状态，退出时写回（过期的租约和冷却记录会被清除）"""
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            now = time.time()
+            state = {
+                "leases": {k: v for k, v in state.get("leases", {}).items() if v["expires"] > now},
+                "cooldown": {k: v for k, v in state.get("cooldown", {}).items() if v > now},
+            }
+            yield state
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _inflight(state: dict) -> dict:
+    counts = {}
+    for lease in state["leases"].values():
+        counts[lease["model"]] = counts.get(lease["model"], 0) + 1
+    return counts
+
+
+def pick(role: str, pools: dict, state_path: str = STATE_FILE, ttl: float = LEASE_TTL) -> dict:
+    """为角色选择当前负载最低的模型并登记租约，返回 {"model", "lease"}（无可用模型时均为 None）"""
+    pool = pools["roles"].get(role)
+    if pool is None:
+        raise ValueError(f"角色 {role} 没有模型池")
+    with _state(state_path) as state:
+        inflight = _inflight(state)
+        best = None
+        for order, entry in enumerate(pool["models"]):
+            load = inflight.get(entry["id"], 0)
+            if load >= entry["max_concurrency"] or entry["id"] in state["cooldown"] or entry["weight"] <= 0:
+                continue
+            key = (load / entry["weight"], order)
+            if best is None or key < best[0]:
+                best = (key, entry["id"])
+        if best is None:
+            return {"model": None, "lease": None}
+        lease = uuid.uuid4().hex
+        state["leases"][lease] = {"model": best[1], "role": role, "expires": time.time() + ttl}
+        return {"model": best[1], "lease": lease}
+
+
+def release(lease: str, cooldown: float = 0, state_path: str = STATE_FILE) -> dict:
+    """结束租约；cooldown > 0 时该模型在此期间不再被选中（用于限流、故障）"""
+    with _state(state_path) as state:
+        info = state["leases"].pop(lease, None)
+        if info is None:
+            return {"released": False}
+        if cooldown > 0:
+            state["cooldown"][info["model"]] = time.time() + cooldown
+        return {"released": True, "model": info["model"]}
+
+
+def status(pools: dict, state_path: str = STATE_FILE) -> dict:
+    """各角色模型池的当前负载"""
+    with _state(state_path) as state:
+        inflight = _inflight(state)
+        now = time.time()
+        return {
+            role: [dict(entry, inflight=inflight.get(entry["id"], 0),
+                        cooldown_s=round(max(state["cooldown"].get(entry["id"], now) - now, 0), 1))
+                   for entry in pool["models"]]
+            for role, pool in pools["roles"].items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="角色模型池路由")
+    parser.add_argument("action", choices=["pick", "release", "fail", "status"])
+    parser.add_argument("target", nargs="?", help="pick 时为角色 ID，release / fail 时为租约")
+    parser.add_argument("--pools", default=POOLS_FILE, help="模型池文件")
+    parser.add_argument("--state", default=STATE_FILE, help="路由状态文件")
+    parser.add_argument("--cooldown", type=float, default=60, help="fail 后暂停该模型的秒数")
+    parser.add_argument("--ttl", type=float, default=LEASE_TTL, help="租约有效期（秒）")
+    args = parser.parse_args()
+
+    if args.action in ("pick", "release", "fail") and not args.target:
+        parser.error(f"{args.action} 需要指定{'角色' if args.action == 'pick' else '租约'}")
+
+    if args.action == "pick":
+        try:
+            result = pick(args.target, load_pools(args.pools), args.state, args.ttl)
+        except (OSError, ValueError) as e:
+            print(json.dumps({"error": str(e)}, ensure_ascii=False))
+            return 1
+    elif args.action == "release":
+        result = release(args.target, 0, args.state)
+    elif args.action == "fail":
+        result = release(args.target, args.cooldown, args.state)
+    else:
+        try:
+            result = status(load_pools(args.pools), args.state)
+        except (OSError, ValueError) as e:
+            print(json.dumps({"error": str(e)}, ensure_ascii=False))
+            return 1
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
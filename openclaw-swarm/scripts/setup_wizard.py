@@ -7,14 +7,28 @@ Agent Swarm 配置向导
 import json
 import os
 import sys
+import argparse
 from pathlib import Path
 
+import model_cache
+import model_classifier
+import model_assignment
+import model_router
+import config_diff
+
 # OpenClaw 配置文件路径
 CONFIG_PATHS = [
     Path.home() / ".openclaw" / "openclaw.json",
     Path("/root/.openclaw/openclaw.json"),
 ]
 
+# 配置补丁格式
+PATCH_FORMATS = {
+    "merge": "RFC 7396 合并补丁，可用于 gateway config.patch（有变化时含完整 agents.list）",
+    "json-patch": "RFC 6902 JSON Patch，只含有变化的字段，用 config_diff.py 应用",
+    "full": "完整 agents.list，可用于 gateway config.patch",
+}
+
 # 智能体角色定义
 AGENT_ROLES = {
     "pm": {"name": "产品经理", "emoji": "📋", "tier": "mid", "desc": "需求分析、任务拆解"},
@@ -118,51 +132,17 @@ RECOMMENDED_MODELS = {
 }
 
 
-def load_openclaw_config():
-    """加载 OpenClaw 配置文件"""
-    for config_path in CONFIG_PATHS:
-        if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f), config_path
-    return None, None
+def get_available_models(config):
+    """从配置中提取可用模型列表（分级规则见 model_classifier.py）"""
+    return model_classifier.classify_config(config)
 
 
-def get_available_models(config):
-    """从配置中提取可用模型列表"""
-    models = []
-    if not config or 'models' not in config:
-        return models
-    
-    providers = config.get('models', {}).get('providers', {})
-    for provider_id, provider_config in providers.items():
-        for model in provider_config.get('models', []):
-            model_id = model.get('id', '')
-            model_name = model.get('name', model_id)
-            full_id = f"{provider_id}/{model_id}"
-            
-            # 判断模型能力等级
-            tier = "mid"
-            model_lower = model_id.lower()
-            if any(x in model_lower for x in ['opus', 'gpt-4', 'pro']):
-                tier = "high"
-            elif any(x in model_lower for x in ['glm', 'flash', 'mini']):
-                tier = "low"
-            
-            # 检测是否支持图像
-            supports_image = 'image' in model.get('input', [])
-            
-            models.append({
-                'full_id': full_id,
-                'provider_id': provider_id,
-                'model_id': model_id,
-                'name': model_name,
-                'tier': tier,
-                'supports_image': supports_image,
-                'reasoning': model.get('reasoning', False),
-                'context_window': model.get('contextWindow', 0)
-            })
-    
-    return models
+def detect_available_models():
+    """可用模型列表及配置文件路径（openclaw.json 未变化时直接用缓存的结果）"""
+    models, config_path = model_cache.cached_models(
+        "setup_wizard", get_available_models, [str(p) for p in CONFIG_PATHS],
+        depends=[model_classifier.__file__])
+    return models, (Path(config_path) if config_path else None)
 
 
 def print_current_models(models):
@@ -198,12 +178,8 @@ def print_current_models(models):
     print("图例: 🖼️=支持图像 🧠=支持推理")
 
 
-def suggest_model_assignment(models):
-    """根据现有模型建议智能体分配"""
-    print("\n" + "="*60)
-    print("🤖 智能体模型分配建议")
-    print("="*60)
-    
+def naive_assignment(models):
+    """每个等级取第一个模型的朴素分配"""
     # 按等级分类模型
     high_models = [m for m in models if m['tier'] == 'high']
     mid_models = [m for m in models if m['tier'] == 'mid']
@@ -215,12 +191,10 @@ def suggest_model_assignment(models):
     best_mid = mid_models[0]['full_id'] if mid_models else best_high
     best_low = low_models[0]['full_id'] if low_models else best_mid
     
-    # 图像模型优先选择名字中带 "image" 的
-    image_priority = [m for m in image_models if 'image' in m['model_id'].lower()]
+    # 图像模型优先选择图像生成模型（名称带 "image"）
+    image_priority = [m for m in models if m['image_output']]
     best_image = image_priority[0]['full_id'] if image_priority else (image_models[0]['full_id'] if image_models else best_mid)
     
-    print("\n根据您的模型配置，建议分配如下：\n")
-    
     assignments = {}
     for agent_id, agent_info in AGENT_ROLES.items():
         tier = agent_info['tier']
@@ -236,14 +210,68 @@ def suggest_model_assignment(models):
         
         if suggested:
             assignments[agent_id] = suggested
-            print(f"  {agent_info['emoji']} {agent_info['name']:8} → {suggested}")
-            print(f"     ({agent_info['desc']})")
     
     return assignments
 
 
-def generate_config_patch(assignments):
-    """生成配置补丁"""
+def suggest_model_assignment(models, assignments=None):
+    """根据现有模型建议智能体分配（未给出 assignments 时使用朴素分配）"""
+    print("\n" + "="*60)
+    print("🤖 智能体模型分配建议")
+    print("="*60)
+    
+    if assignments is None:
+        assignments = naive_assignment(models)
+    
+    print("\n根据您的模型配置，建议分配如下：\n")
+    
+    for agent_id, suggested in assignments.items():
+        agent_info = AGENT_ROLES[agent_id]
+        print(f"  {agent_info['emoji']} {agent_info['name']:8} → {suggested}")
+        print(f"     ({agent_info['desc']})")
+    
+    return assignments
+
+
+def solve_model_assignment(models, objective, volumes, overrides=None, budget=None, latency_slo=None):
+    """按成本 / 延迟求解分配（见 model_assignment.py），返回 (分配, 与朴素分配的对比)"""
+    solved = model_assignment.solve(models, AGENT_ROLES, volumes, objective,
+                                    budget=budget, latency_slo=latency_slo, overrides=overrides)
+    naive = model_assignment.evaluate(naive_assignment(models), models, AGENT_ROLES, volumes, overrides)
+    report = model_assignment.compare(naive, solved)
+    report["feasible"] = solved["feasible"]
+    report["roles"] = {
+        role_id: {
+            "naive": naive["assignments"].get(role_id),
+            "solved": info["model"],
+            "cost": round(info["cost"], 6),
+            "p95_latency_s": round(info["p95_latency_s"], 2),
+            "volume": volumes[role_id]["source"],
+        }
+        for role_id, info in solved["roles"].items()
+    }
+    return solved["assignments"], report
+
+
+def print_assignment_report(report):
+    """打印求解结果与朴素分配的对比"""
+    print("\n" + "="*60)
+    print("💰 分配求解报告（每次运行的预期值）")
+    print("="*60)
+    if not report["feasible"]:
+        print("⚠️  无法同时满足预算 / 延迟约束，以下为最接近的分配")
+    for role_id, row in report["roles"].items():
+        mark = "  " if row["naive"] == row["solved"] else "* "
+        print(f"  {mark}{role_id:15} {row['solved']}  ${row['cost']:.4f}  p95 {row['p95_latency_s']}s")
+        if row["naive"] != row["solved"]:
+            print(f"     （朴素分配: {row['naive']}）")
+    print(f"\n  朴素分配: ${report['naive_cost']:.4f} / 次, p95 {report['naive_p95_latency_s']}s")
+    print(f"  求解分配: ${report['solved_cost']:.4f} / 次, p95 {report['solved_p95_latency_s']}s")
+    print(f"  节省: ${report['cost_saved']:.4f} ({report['cost_saved_pct']}%)")
+
+
+def generate_config_patch(assignments, pools=None):
+    """生成配置补丁（给出模型池时，池中其余模型按顺序写入 model.fallbacks）"""
     agents_list = []
     
     # main agent
@@ -258,10 +286,16 @@ def generate_config_patch(assignments):
     # sub agents
     for agent_id, model_id in assignments.items():
         agent_info = AGENT_ROLES[agent_id]
+        model = {"primary": model_id}
+        pool = (pools or {}).get("roles", {}).get(agent_id)
+        if pool:
+            fallbacks = [entry["id"] for entry in pool["models"] if entry["id"] != model_id]
+            if fallbacks:
+                model["fallbacks"] = fallbacks
         agents_list.append({
             "id": agent_id,
             "workspace": f"/workspace/agents/{agent_id}",
-            "model": {"primary": model_id},
+            "model": model,
             "identity": {"name": agent_info['name'], "emoji": agent_info['emoji']}
         })
     
@@ -270,20 +304,34 @@ def generate_config_patch(assignments):
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="Agent Swarm 配置向导")
+    parser.add_argument("--objective", choices=["tier", "cost", "latency"], default="tier",
+                        help="分配方式：tier 每个等级取第一个模型；cost 最小化花费；latency 最小化 p95 延迟")
+    parser.add_argument("--budget", type=float, help="每次运行的预算（美元，latency 目标时使用）")
+    parser.add_argument("--latency-slo", type=float, help="各角色 p95 延迟上限（秒，cost 目标时使用）")
+    parser.add_argument("--stats", help="运行统计（JSONL，每行一次 spawn 的 agent / input_tokens / output_tokens）")
+    parser.add_argument("--profile", help="模型信息覆盖（JSON：{模型 ID: {cost, ttft_s, tokens_per_s, max_concurrency, weight}}）")
+    parser.add_argument("--patch-format", choices=list(PATCH_FORMATS), default="merge",
+                        help="补丁格式：merge 合并补丁（RFC 7396，默认，可用于 gateway config.patch；"
+                             "数组只能整体替换，有变化时含完整 agents.list）；"
+                             "json-patch 只含变化（RFC 6902，用 config_diff.py 应用）；full 完整 agents.list")
+    parser.add_argument("--pool-size", type=int, default=model_router.DEFAULT_POOL_SIZE,
+                        help="每个角色模型池的大小（首选 + 备选，1 表示不设备选）")
+    args = parser.parse_args()
+    
     print("\n" + "🚀 Agent Swarm 配置向导".center(60))
     print("="*60)
     
     # 1. 加载配置
-    config, config_path = load_openclaw_config()
-    if config:
+    models, config_path = detect_available_models()
+    if config_path:
         print(f"✅ 已加载配置文件: {config_path}")
     else:
         print("❌ 未找到 OpenClaw 配置文件")
         print("   请确保 ~/.openclaw/openclaw.json 存在")
         return
     
-    # 2. 获取可用模型
-    models = get_available_models(config)
+    # 2. 显示可用模型
     print_current_models(models)
     
     if not models:
@@ -294,27 +342,63 @@ def main():
         return
     
     # 3. 建议分配
-    assignments = suggest_model_assignment(models)
+    records = model_assignment.load_json_records(args.stats) if args.stats else []
+    overrides = model_assignment.load_profile(args.profile) if args.profile else {}
+    volumes = model_assignment.role_volumes(records, AGENT_ROLES)
+    if args.objective == "tier":
+        assignments = suggest_model_assignment(models)
+    else:
+        assignments, report = solve_model_assignment(
+            models, args.objective, volumes, overrides, budget=args.budget, latency_slo=args.latency_slo)
+        suggest_model_assignment(models, assignments)
+        print_assignment_report(report)
+    
+    pools = model_router.build_pools(models, AGENT_ROLES, volumes, assignments,
+                                     size=max(args.pool_size, 1), overrides=overrides)
+    
+    # 4. 与当前配置比较，生成补丁
+    desired = generate_config_patch(assignments, pools)
+    if args.patch_format == "full":
+        patch = desired
+        summary = None
+    else:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        ops, summary = config_diff.diff_agents(current, desired["agents"]["list"])
+        patch = ops if args.patch_format == "json-patch" else config_diff.merge_patch(current, ops)
     
-    # 4. 输出配置补丁
     print("\n" + "="*60)
-    print("📝 生成的配置补丁 (可用于 gateway config.patch)")
+    print(f"📝 生成的配置补丁 ({PATCH_FORMATS[args.patch_format]})")
     print("="*60)
-    
-    patch = generate_config_patch(assignments)
     print(json.dumps(patch, indent=2, ensure_ascii=False))
     
+    if summary is not None:
+        by_op = ", ".join(f"{op} {n}" for op, n in summary["by_op"].items()) or "无"
+        print(f"\n📊 变更摘要: {summary['operations']} 个操作 ({by_op})")
+        print(f"   新增智能体: {', '.join(summary['agents_added']) or '无'}")
+        print(f"   修改智能体: {', '.join(summary['agents_changed']) or '无'}")
+        print(f"   未变化: {summary['agents_unchanged']} 个")
+    
     # 5. 保存到文件
     output_path = Path(__file__).parent.parent / "config-patch.json"
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(patch, f, indent=2, ensure_ascii=False)
     print(f"\n✅ 配置已保存到: {output_path}")
     
+    pools_path = Path(__file__).parent.parent / "routing-pools.json"
+    model_router.save_pools(pools, str(pools_path))
+    print(f"✅ 模型池已保存到: {pools_path}（供 model_router.py 使用）")
+    
     print("\n" + "="*60)
     print("下一步操作：")
     print("  1. 检查上方配置是否符合预期")
     print("  2. 如需修改，编辑 config-patch.json")
-    print("  3. 使用 gateway config.patch 应用配置")
+    if not patch:
+        print("  3. 当前配置已与建议一致，无需应用补丁")
+    elif args.patch_format == "json-patch":
+        print(f"  3. 应用补丁: python3 scripts/config_diff.py apply config-patch.json {config_path} --in-place")
+    else:
+        print("  3. 使用 gateway config.patch 应用配置（也可用 scripts/config_diff.py apply 预览）")
     print("="*60)
 
 
@@ -12,18 +12,31 @@ Agent Swarm 强制入口脚本
 - "ready" → 直接进入任务编排
 - "init_success" → 初始化完成
 - "reset_success" → 重置完成
+
+check 的快速路径：上一次 check 的输出连同判定依据（生成输出的代码文件和配置文件的
+mtime/大小，未初始化时还有 openclaw.json 的 mtime/大小）缓存在 .swarm-status 中，
+升级脚本或分级规则后记录自动失效。
+依据未变时只需一次 stat + 一次读文件即可原样输出，不解析 JSON、不检测模型；
+其余模块（json、argparse 等）都推迟到慢路径才导入。
 """
 
 import os
 import sys
-import json
-import subprocess
-from datetime import datetime
 
 # 路径配置
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SKILL_DIR = os.path.dirname(SCRIPT_DIR)
 CONFIG_FILE = os.path.join(SKILL_DIR, ".swarm-config.json")
+STATUS_FILE = os.path.join(SKILL_DIR, ".swarm-status")
+STATUS_VERSION = "v2"
+# check 的输出依赖的代码（本文件与模型分级 / 缓存模块）
+CODE_FILES = [os.path.join(SCRIPT_DIR, name) for name in ("swarm_entry.py", "model_classifier.py", "model_cache.py")]
+
+# openclaw.json 的候选位置（按顺序取第一个存在的）
+OPENCLAW_CONFIG_PATHS = [
+    os.path.expanduser("~/.openclaw/openclaw.json"),
+    "/root/.openclaw/openclaw.json",
+]
 
 # 默认智能体列表
 DEFAULT_AGENTS = [
@@ -47,8 +60,64 @@ MODEL_TIERS = {
 }
 
 
+def _stat_key(path: str) -> str:
+    """文件的 mtime:大小，不存在时为 "-"（用作缓存依据）"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _models_key() -> str:
+    return ",".join(_stat_key(path) for path in OPENCLAW_CONFIG_PATHS)
+
+
+def _code_key() -> str:
+    return ",".join(_stat_key(path) for path in CODE_FILES)
+
+
+def fast_check():
+    """
+    用缓存的状态记录回答 check，依据失效时返回 None
+
+    记录格式：首行 "v2 <代码依据> <配置文件依据> <openclaw.json 依据或 *>"，其后为完整输出。
+    已初始化时只 stat 代码文件和配置文件。
+    """
+    try:
+        with open(STATUS_FILE, "r", encoding="utf-8") as f:
+            header, _, output = f.read().partition("\n")
+    except OSError:
+        return None
+    parts = header.split(" ")
+    if len(parts) != 4 or parts[0] != STATUS_VERSION or parts[2] != _stat_key(CONFIG_FILE):
+        return None
+    if parts[1] != _code_key():
+        return None
+    if parts[3] != "*" and parts[3] != _models_key():
+        return None
+    return output
+
+
+def save_status(output: str, code_key: str, config_key: str, models_key: str):
+    """
+    保存 check 的输出供快速路径使用（写失败不影响正常输出）
+
+    依据须在计算输出之前取得，计算期间文件若被修改，记录会在下次 check 时失效。
+    """
+    header = f"{STATUS_VERSION} {code_key} {config_key} {models_key}"
+    tmp = f"{STATUS_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"{header}\n{output}")
+        os.replace(tmp, STATUS_FILE)
+    except OSError:
+        pass
+
+
 def load_config():
     """加载配置文件"""
+    import json
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, "r", encoding="utf-8") as f:
@@ -60,6 +129,7 @@ def load_config():
 
 def save_config(config):
     """保存配置文件"""
+    import json
     with open(CONFIG_FILE, "w", encoding="utf-8") as f:
         json.dump(config, f, indent=2, ensure_ascii=False)
 
@@ -70,16 +140,9 @@ def is_initialized():
     return config.get("initialized", False)
 
 
-def detect_models():
-    """
-    检测 OpenClaw 已配置的模型
-    返回按等级分类的模型列表
-    """
-    # 尝试读取 openclaw.json 配置
-    possible_paths = [
-        os.path.expanduser("~/.openclaw/openclaw.json"),
-        "/root/.openclaw/openclaw.json",
-    ]
+def classify_models(config):
+    """把 openclaw.json 中的模型按等级分类（config 为 None 时各等级均为空）"""
+    import model_classifier
     
     models = {
         "high": [],
@@ -87,50 +150,32 @@ def detect_models():
         "light": [],
         "image": [],
     }
+    bucket = {"high": "high", "mid": "medium", "low": "light"}
     
-    for config_path in possible_paths:
-        if os.path.exists(config_path):
-            try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                
-                providers = config.get("models", {}).get("providers", {})
-                
-                for provider_id, provider_config in providers.items():
-                    provider_models = provider_config.get("models", [])
-                    for model in provider_models:
-                        model_id = model.get("id", "")
-                        model_name = model.get("name", model_id)
-                        full_id = f"{provider_id}/{model_id}"
-                        
-                        model_info = {
-                            "id": full_id,
-                            "name": model_name,
-                            "provider": provider_id,
-                        }
-                        
-                        # 按模型名称分类
-                        name_lower = model_name.lower()
-                        id_lower = model_id.lower()
-                        
-                        if "image" in name_lower or "image" in id_lower:
-                            models["image"].append(model_info)
-                        elif any(x in name_lower for x in ["opus", "gpt-4", "claude-4"]):
-                            models["high"].append(model_info)
-                        elif any(x in name_lower for x in ["sonnet", "gemini", "pro"]):
-                            models["medium"].append(model_info)
-                        elif any(x in name_lower for x in ["glm", "deepseek", "qwen"]):
-                            models["light"].append(model_info)
-                        else:
-                            models["medium"].append(model_info)  # 默认中等
-                
-                break  # 找到配置就停止
-            except Exception as e:
-                pass
+    for record in model_classifier.classify_config(config):
+        model_info = {
+            "id": record["full_id"],
+            "name": record["name"],
+            "provider": record["provider_id"],
+        }
+        key = "image" if record["image_output"] else bucket[record["tier"]]
+        models[key].append(model_info)
     
     return models
 
 
+def detect_models():
+    """
+    检测 OpenClaw 已配置的模型
+    返回按等级分类的模型列表（openclaw.json 未变化时直接用缓存的分类结果）
+    """
+    import model_cache
+    
+    models, _ = model_cache.cached_models("swarm_entry", classify_models, OPENCLAW_CONFIG_PATHS,
+                                          depends=[os.path.join(SCRIPT_DIR, "model_classifier.py")])
+    return models
+
+
 def format_models_display(models):
     """格式化模型展示内容"""
     lines = ["## 📦 您的 OpenClaw 已配置以下模型\n"]
@@ -180,6 +225,7 @@ def get_available_agents():
 
 def do_init(model_mapping=None):
     """执行初始化"""
+    from datetime import datetime
     config = {
         "initialized": True,
         "version": "1.0.0",
@@ -200,6 +246,14 @@ def do_reset():
 
 def main():
     """主入口"""
+    # 快速路径：check（默认操作）且状态记录有效时直接输出
+    if sys.argv[1:] in ([], ["--action", "check"], ["--action=check"]):
+        output = fast_check()
+        if output is not None:
+            sys.stdout.write(output)
+            return 0
+    
+    import json
     import argparse
     
     parser = argparse.ArgumentParser(description="Agent Swarm 强制入口")
@@ -212,6 +266,7 @@ def main():
     result = {}
     
     if args.action == "check":
+        code_key, config_key, models_key = _code_key(), _stat_key(CONFIG_FILE), _models_key()
         if is_initialized():
             # 已初始化，返回 ready 状态
             result = {
@@ -260,7 +315,10 @@ def main():
         }
     
     # 输出 JSON
-    print(json.dumps(result, ensure_ascii=False, indent=2))
+    output = json.dumps(result, ensure_ascii=False, indent=2) + "\n"
+    if args.action == "check":
+        save_status(output, code_key, config_key, "*" if result["status"] == "ready" else models_key)
+    sys.stdout.write(output)
     return 0
 
 